@@ -0,0 +1,405 @@
+"""
+StructScan AI – HTTP inference service.
+
+Concurrent uploads are queued and grouped into micro-batches (up to
+MAX_BATCH_SIZE images, waiting at most MAX_WAIT_MS for a batch to
+fill) that go through one batched YOLO call on a single model worker.
+When the queue is full new requests are rejected with 503 instead of
+piling up, and each request gives up with 504 after REQUEST_TIMEOUT_S.
+
+Models come from the shared model registry: /predict?model_version=
+selects a crack model version (for A/B runs), GET /models lists them,
+and POST /models/{name}/activate hot-swaps the default version when
+STRUCTSCAN_ADMIN_TOKEN is set (sent as the X-Admin-Token header);
+runs trained after startup can be activated by their run name.
+
+Artifact images under /artifacts are kept for ARTIFACT_TTL_S and the
+directory is capped at ARTIFACT_MAX_MB (oldest files go first); a
+background task prunes it every ARTIFACT_CLEANUP_INTERVAL_S.
+
+Run from the project root:
+    uvicorn deployment.api.main:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, File, Header, HTTPException, Query, UploadFile
+from fastapi.responses import PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+
+# ==================================================
+# PATH FIX
+# ==================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src import telemetry
+from src.inference.detect import ARTIFACTS, decode_image, detect_batch
+from src.model_registry import register_trained_runs
+from src.pipeline import BACKEND, INT8, STARTUP_TIMINGS, get_model_registry, load_models
+
+# ==================================================
+# SETTINGS
+# ==================================================
+MAX_BATCH_SIZE = int(os.environ.get("STRUCTSCAN_MAX_BATCH_SIZE", 8))
+MAX_WAIT_MS = float(os.environ.get("STRUCTSCAN_MAX_WAIT_MS", 25))
+MAX_QUEUE_SIZE = int(os.environ.get("STRUCTSCAN_MAX_QUEUE_SIZE", 64))
+REQUEST_TIMEOUT_S = float(os.environ.get("STRUCTSCAN_REQUEST_TIMEOUT_S", 60))
+CONF_THRESHOLD = float(os.environ.get("STRUCTSCAN_CONF_THRESHOLD", 0.25))
+ADMIN_TOKEN = os.environ.get("STRUCTSCAN_ADMIN_TOKEN")
+
+logger = logging.getLogger("structscan.api")
+
+ARTIFACT_DIR = os.path.join(PROJECT_ROOT, "results", "api")
+ARTIFACT_TTL_S = float(os.environ.get("STRUCTSCAN_ARTIFACT_TTL_S", 24 * 3600))
+ARTIFACT_MAX_MB = float(os.environ.get("STRUCTSCAN_ARTIFACT_MAX_MB", 1024))
+ARTIFACT_CLEANUP_INTERVAL_S = float(os.environ.get("STRUCTSCAN_ARTIFACT_CLEANUP_INTERVAL_S", 300))
+
+
+# ==================================================
+# MICRO-BATCHER
+# ==================================================
+class QueueFullError(Exception):
+    pass
+
+
+class MicroBatcher:
+    """
+    Collects concurrently submitted items into batches and runs
+    `handler(items) -> results` on a single background thread. A
+    result may be an exception, failing only that item's request; an
+    exception raised by the handler fails the whole batch.
+    """
+
+    def __init__(self, handler, max_batch_size, max_wait_s, max_queue_size):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, item, timeout):
+        """
+        Queue one item and wait for its result.
+
+        Raises QueueFullError when the service is saturated and
+        asyncio.TimeoutError after `timeout` seconds.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFullError()
+
+        # On timeout wait_for cancels the future, and the worker
+        # skips it if the batch has not started yet.
+        return await asyncio.wait_for(future, timeout)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.handler, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+# ==================================================
+# INFERENCE HANDLER
+# ==================================================
+def _run_batch(items):
+    """
+    items: list of (request_id, decoded image, include_artifacts,
+    model version or None for the active one)
+
+    Images are passed in memory; artifacts are only built and written
+    for requests that asked for them. Requests for the same model
+    version share one batched call, holding a registry lease so a
+    concurrent swap cannot evict the model mid-batch. A failure only
+    fails the requests of its version group (the exception is returned
+    in their place).
+    """
+    registry = get_model_registry()
+    results = [None] * len(items)
+
+    groups = {}
+    for i, (_, _, _, version) in enumerate(items):
+        try:
+            resolved = registry.resolve("crack", version)
+        except KeyError as e:
+            results[i] = e
+            continue
+        groups.setdefault(resolved, []).append(items[i] + (i,))
+
+    for version, group in groups.items():
+        try:
+            with registry.lease("crack", version, backend=BACKEND, int8=INT8) as model:
+                outputs = list(
+                    detect_batch(
+                        model,
+                        [image for _, image, _, _, _ in group],
+                        conf_threshold=CONF_THRESHOLD,
+                        batch_size=len(group),
+                        output_paths=[
+                            os.path.join(ARTIFACT_DIR, f"{request_id}.jpg") if include_artifacts else None
+                            for request_id, _, include_artifacts, _, _ in group
+                        ],
+                        artifacts=[
+                            ARTIFACTS if include_artifacts else ()
+                            for _, _, include_artifacts, _, _ in group
+                        ]
+                    )
+                )
+        except Exception as e:
+            logger.warning("Inference failed for model version %s: %s", version, e)
+            for *_, i in group:
+                results[i] = e
+            continue
+        for (_, _, _, _, i), result in zip(group, outputs):
+            results[i] = dict(result, model_version=version)
+
+    return results
+
+
+def _to_response(request_id, result, include_artifacts):
+    response = {
+        "id": request_id,
+        "crack_percentage": result["crack_percentage"],
+        "severity_score": result["severity_score"],
+        "risk_level": result["risk_level"],
+        "detections": result["detections"],
+        "model_version": result["model_version"],
+    }
+
+    if include_artifacts:
+        response["artifacts"] = {
+            "annotated_image": f"/artifacts/{os.path.basename(result['annotated_image_path'])}",
+            "heatmap": f"/artifacts/{os.path.basename(result['heatmap_path'])}",
+        }
+
+    return response
+
+
+# ==================================================
+# ARTIFACT RETENTION
+# ==================================================
+def prune_artifacts(ttl_s=ARTIFACT_TTL_S, max_bytes=ARTIFACT_MAX_MB * 1024 * 1024, now=None):
+    """
+    Delete artifacts older than `ttl_s`, then the oldest ones until the
+    directory fits in `max_bytes`. Returns how many files were deleted.
+    """
+    now = time.time() if now is None else now
+    files = []
+    for entry in os.scandir(ARTIFACT_DIR):
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            continue
+    files.sort()
+
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for mtime, size, path in files:
+        if now - mtime <= ttl_s and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
+
+
+async def _prune_artifacts_periodically(interval_s):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            deleted = await loop.run_in_executor(None, prune_artifacts)
+            telemetry.count("artifacts_pruned", deleted)
+        except OSError as e:
+            logger.warning("Artifact cleanup failed: %s", e)
+        await asyncio.sleep(interval_s)
+
+
+# ==================================================
+# APP
+# ==================================================
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    # Loads and warms the active crack model in the shared registry
+    load_models(warmup=True)
+    batcher = MicroBatcher(
+        handler=_run_batch,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_s=MAX_WAIT_MS / 1000,
+        max_queue_size=MAX_QUEUE_SIZE
+    )
+    batcher.start()
+    app.state.batcher = batcher
+    janitor = asyncio.create_task(_prune_artifacts_periodically(ARTIFACT_CLEANUP_INTERVAL_S))
+
+    yield
+
+    janitor.cancel()
+    try:
+        await janitor
+    except asyncio.CancelledError:
+        pass
+    await batcher.stop()
+
+
+app = FastAPI(title="StructScan AI", lifespan=lifespan)
+
+# The directory is created on startup (see lifespan)
+app.mount("/artifacts", StaticFiles(directory=ARTIFACT_DIR, check_dir=False), name="artifacts")
+
+
+@app.get("/health")
+async def health():
+    batcher = app.state.batcher
+    return {
+        "status": "ok",
+        "queued": batcher.queue.qsize(),
+        "startup": STARTUP_TIMINGS,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics; populated when STRUCTSCAN_TELEMETRY=1.
+    """
+    return telemetry.prometheus_text()
+
+
+@app.get("/models")
+async def models():
+    registry = get_model_registry()
+    # List runs trained since startup too
+    await asyncio.to_thread(register_trained_runs, registry)
+    return registry.stats()
+
+
+@app.post("/models/{name}/activate")
+async def activate_model(
+    name: str,
+    version: str = Query(...),
+    x_admin_token: str = Header(None)
+):
+    """
+    Hot-swap: load `version` of model `name`, then make it the default.
+    In-flight batches finish on the model they started with. Crack
+    runs trained since startup (runs/detect/<run>/weights/best.pt) are
+    picked up here, without a restart.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Model administration is disabled")
+    if not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    registry = get_model_registry()
+    if name == "crack" and version not in registry.versions(name):
+        await asyncio.to_thread(register_trained_runs, registry)
+    try:
+        registry.resolve(name, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    options = {"backend": BACKEND, "int8": INT8} if name == "crack" else {}
+    try:
+        await asyncio.to_thread(registry.swap, name, version, **options)
+    except (OSError, RuntimeError) as e:
+        raise HTTPException(status_code=500, detail=f"Could not load {name} {version}: {e}")
+
+    return {"name": name, "active": registry.active_version(name)}
+
+
+@app.post("/predict")
+async def predict(
+    image: UploadFile = File(...),
+    include_artifacts: bool = Query(False),
+    model_version: str = Query(None)
+):
+    batcher = app.state.batcher
+
+    if model_version is not None and model_version not in get_model_registry().versions("crack"):
+        raise HTTPException(status_code=400, detail=f"Unknown model version: {model_version}")
+    if batcher.queue.full():
+        raise HTTPException(status_code=503, detail="Inference queue is full, retry later")
+
+    try:
+        decoded = await asyncio.to_thread(decode_image, await image.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    request_id = uuid.uuid4().hex
+
+    try:
+        result = await batcher.submit(
+            (request_id, decoded, include_artifacts, model_version),
+            REQUEST_TIMEOUT_S
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Inference queue is full, retry later")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
+
+    return _to_response(request_id, result, include_artifacts)
@@ -1,15 +1,246 @@
+"""
+Derive YOLO box labels from binary crack masks.
+
+For every image in data/processed/<split>/images with a mask of the
+same stem in data/processed/<split>/masks, the mask is closed (so the
+broken fragments of one crack merge into one component), split into
+connected components, and each component above a minimum area becomes
+one "0 xc yc w h" box; smaller fragments are folded into a nearby box.
+An empty mask gives an empty label file, i.e. a background image.
+
+Images without a mask are skipped and reported, and their labels left
+as they are; no placeholder labels are written. With --prune-unmasked,
+an existing full-frame placeholder ("0 0.5 0.5 1.0 1.0") for such an
+image is deleted rather than left to be trained on. Labels newer than
+their mask are left alone, except that placeholder, which is always
+regenerated. Splits without images or masks are skipped, and nothing
+is touched when no split has any mask.
+
+    python generate_labels.py --splits train val --workers 8
+"""
+
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+SPLITS = ["train", "val"]
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+MASK_EXTS = (".png", ".bmp", ".jpg", ".jpeg", ".tif", ".tiff")
+PLACEHOLDER = "0 0.5 0.5 1.0 1.0"
+
+
+# ==================================================
+# MASK -> BOXES
+# ==================================================
+def mask_to_boxes(mask, merge_px=5, min_area=0.0005, attach_px=25):
+    """
+    (N, 4) float32 normalised xc, yc, w, h for the crack components of
+    a binary mask. Components closer than `merge_px` are merged.
+    Components smaller than `min_area` (fraction of the image) are
+    merged into the box of the nearest larger component within
+    `attach_px`, and dropped as noise otherwise.
+    """
+    height, width = mask.shape[:2]
+    binary = (mask > 127).astype(np.uint8)
+
+    if merge_px > 0:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * merge_px + 1, 2 * merge_px + 1))
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    stats = stats[1:]  # drop the background component
+
+    x0 = stats[:, cv2.CC_STAT_LEFT].astype(np.float32)
+    y0 = stats[:, cv2.CC_STAT_TOP].astype(np.float32)
+    boxes = np.stack([
+        x0,
+        y0,
+        x0 + stats[:, cv2.CC_STAT_WIDTH],
+        y0 + stats[:, cv2.CC_STAT_HEIGHT],
+    ], axis=1)
+
+    large = stats[:, cv2.CC_STAT_AREA] >= min_area * width * height
+    boxes = _attach_fragments(boxes[large], boxes[~large], attach_px)
+
+    x0, y0, x1, y1 = boxes.T
+    return np.stack([
+        (x0 + x1) / 2 / width,
+        (y0 + y1) / 2 / height,
+        (x1 - x0) / width,
+        (y1 - y0) / height,
+    ], axis=1)
+
+
+def _attach_fragments(boxes, fragments, attach_px):
+    """
+    Grow each x0, y0, x1, y1 box in `boxes` to cover the fragments
+    whose nearest box is within `attach_px` (gap between the boxes).
+    """
+    if len(boxes) == 0 or len(fragments) == 0:
+        return boxes
+
+    # (fragments, boxes) gap between rectangles; 0 where they overlap
+    dx = np.maximum(0, np.maximum(boxes[None, :, 0] - fragments[:, None, 2], fragments[:, None, 0] - boxes[None, :, 2]))
+    dy = np.maximum(0, np.maximum(boxes[None, :, 1] - fragments[:, None, 3], fragments[:, None, 1] - boxes[None, :, 3]))
+    gap = np.hypot(dx, dy)
+
+    nearest = gap.argmin(axis=1)
+    attached = gap[np.arange(len(fragments)), nearest] <= attach_px
+
+    boxes = boxes.copy()
+    np.minimum.at(boxes[:, 0], nearest[attached], fragments[attached, 0])
+    np.minimum.at(boxes[:, 1], nearest[attached], fragments[attached, 1])
+    np.maximum.at(boxes[:, 2], nearest[attached], fragments[attached, 2])
+    np.maximum.at(boxes[:, 3], nearest[attached], fragments[attached, 3])
+    return boxes
+
+
+def _label_job(mask_path, label_path, merge_px, min_area, attach_px):
+    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise ValueError(f"Failed to read mask: {mask_path}")
+
+    boxes = mask_to_boxes(mask, merge_px=merge_px, min_area=min_area, attach_px=attach_px)
+    with open(label_path, "w") as f:
+        f.writelines(
+            f"0 {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n" for xc, yc, w, h in boxes
+        )
+    return len(boxes)
+
+
+# ==================================================
+# INCREMENTAL SKIP
+# ==================================================
+def _find_mask(mask_dir, stem):
+    for ext in MASK_EXTS:
+        path = os.path.join(mask_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _has_masks(mask_dir):
+    try:
+        return any(name.lower().endswith(MASK_EXTS) for name in os.listdir(mask_dir))
+    except FileNotFoundError:
+        return False
+
+
+def _is_placeholder(label_path):
+    with open(label_path) as f:
+        return f.read().strip() == PLACEHOLDER
+
+
+def _is_current(label_path, mask_path):
+    try:
+        if os.path.getmtime(label_path) < os.path.getmtime(mask_path):
+            return False
+    except OSError:
+        return False
+    return not _is_placeholder(label_path)
+
+
+# ==================================================
+# BATCH
+# ==================================================
+def generate_labels(
+    splits=SPLITS,
+    base="data/processed",
+    merge_px=5,
+    min_area=0.0005,
+    attach_px=25,
+    workers=None,
+    force=False,
+    prune_unmasked=False
+):
+    """
+    Write labels for every split. Returns {split: stats dict}.
+
+    Raises FileNotFoundError, before changing anything, if none of the
+    splits has a masks directory with masks in it.
+    """
+    usable = []
+    for split in splits:
+        if not os.path.isdir(f"{base}/{split}/images"):
+            print(f"{split}: no images directory, skipped")
+        elif not _has_masks(f"{base}/{split}/masks"):
+            print(f"{split}: no masks, skipped")
+        else:
+            usable.append(split)
+    if not usable:
+        raise FileNotFoundError(f"No masks found under {base}/<split>/masks; nothing to label")
+
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for split in usable:
+            img_dir = f"{base}/{split}/images"
+            mask_dir = f"{base}/{split}/masks"
+            label_dir = f"{base}/{split}/labels"
+            os.makedirs(label_dir, exist_ok=True)
+
+            stats = {"labelled": 0, "boxes": 0, "skipped": 0, "no_mask": 0, "placeholders_removed": 0, "failed": 0}
+            futures = {}
+
+            for img in sorted(os.listdir(img_dir)):
+                if not img.lower().endswith(IMAGE_EXTS):
+                    continue
+                stem = os.path.splitext(img)[0]
+                label_path = os.path.join(label_dir, stem + ".txt")
+                mask_path = _find_mask(mask_dir, stem)
+                if mask_path is None:
+                    # A full-frame placeholder would still be trained on
+                    if prune_unmasked and os.path.exists(label_path) and _is_placeholder(label_path):
+                        os.remove(label_path)
+                        stats["placeholders_removed"] += 1
+                    stats["no_mask"] += 1
+                    continue
+
+                if not force and _is_current(label_path, mask_path):
+                    stats["skipped"] += 1
+                    continue
+
+                futures[pool.submit(_label_job, mask_path, label_path, merge_px, min_area, attach_px)] = img
+
+            for future, img in futures.items():
+                try:
+                    stats["boxes"] += future.result()
+                    stats["labelled"] += 1
+                except Exception as e:
+                    print(f"skipping {img}: {e}")
+                    stats["failed"] += 1
+
+            print(f"{split}: {stats}")
+            if stats["no_mask"]:
+                print(f"warning: {stats['no_mask']} {split} images have no mask; no labels generated for them")
+            results[split] = stats
+
+    return results
 
-splits = ["train", "val"]
 
-for split in splits:
-    img_dir = f"data/processed/{split}/images"
-    label_dir = f"data/processed/{split}/labels"
-    os.makedirs(label_dir, exist_ok=True)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate YOLO labels from crack masks")
+    parser.add_argument("--splits", nargs="+", default=SPLITS)
+    parser.add_argument("--base", default="data/processed")
+    parser.add_argument("--merge-px", type=int, default=5, help="join fragments closer than this")
+    parser.add_argument("--min-area", type=float, default=0.0005, help="min component area (fraction of image)")
+    parser.add_argument("--attach-px", type=int, default=25, help="merge smaller components into a box within this")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="regenerate every label")
+    parser.add_argument(
+        "--prune-unmasked", action="store_true",
+        help="delete full-frame placeholder labels of images without a mask"
+    )
+    args = parser.parse_args()
 
-    for img in os.listdir(img_dir):
-        if img.lower().endswith((".jpg", ".png")):
-            label_file = img.rsplit(".", 1)[0] + ".txt"
-            with open(os.path.join(label_dir, label_file), "w") as f:
-                # class 0 = crack, full-image bounding box
-                f.write("0 0.5 0.5 1.0 1.0\n")
+    try:
+        generate_labels(
+            args.splits, args.base, args.merge_px, args.min_area, args.attach_px,
+            args.workers, args.force, args.prune_unmasked
+        )
+    except FileNotFoundError as e:
+        print(e)
+        raise SystemExit(1)
@@ -0,0 +1,384 @@
+"""
+Stage-level benchmark for the inspection pipeline.
+
+Times the public entry points over images from
+data/processed/test/images, either one run_pipeline_image call per
+image or (with --batch-size) one detect_batch call per batch, and
+reports latency percentiles (p50/p95/p99), throughput and memory:
+
+    total        the entry-point call (per image or per batch)
+    decode       image decoding
+    inference    model forward pass
+    postprocess  box extraction, metrics and annotation
+    heatmap      heatmap overlay
+    encode       encoding of both output images
+    pdf          generate_pdf_report from the encoded images
+
+Stage timings come from the pipeline's own telemetry spans, so they
+measure exactly what production code runs. In batch mode decode and
+inference are timed per batch; throughput is always in images/s.
+
+Memory: per stage, `process_rss_mb` is the resident size of the whole
+process right after the stage (not the stage's own use); the report
+also gives the process peak and the largest RSS growth over a single
+entry-point call.
+
+Usage:
+    python -m src.benchmark run --limit 100 --output bench.json
+    python -m src.benchmark compare bench.json --baseline baseline.json
+
+`compare` exits with status 1 when a stage regressed by more than
+--tolerance against the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src import telemetry
+from src.inference.detect import detect_batch, encode_image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_IMAGE_DIR = PROJECT_ROOT / "data" / "processed" / "test" / "images"
+
+STAGES = ("total", "decode", "inference", "postprocess", "heatmap", "encode", "pdf")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+# ==================================================
+# MEMORY
+# ==================================================
+def current_rss_mb() -> float:
+    """
+    Resident set size of this process right now, from /proc or psutil
+    (if installed); falls back to peak_rss_mb().
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    psutil = _psutil()
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process: ru_maxrss, the peak
+    working set via psutil on Windows, or else the peak of Python
+    allocations traced since track_memory().
+    """
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return maxrss / divisor
+
+    psutil = _psutil()
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    return 0.0
+
+
+def track_memory():
+    """
+    Start tracemalloc when peak_rss_mb() has nothing better to use.
+    """
+    if resource is None and _psutil() is None and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _psutil():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+# ==================================================
+# STAGE TIMER
+# ==================================================
+class StageTimer:
+    """
+    Collects stage durations, either timed directly with run() or
+    from telemetry span events (pass on_event to telemetry.add_hook).
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.images = {}
+        self.rss = {}
+
+    def record(self, stage, duration, images=1):
+        self.latencies.setdefault(stage, []).append(duration)
+        self.images[stage] = self.images.get(stage, 0) + images
+        self.rss[stage] = max(self.rss.get(stage, 0.0), current_rss_mb())
+
+    def run(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.record(stage, time.perf_counter() - start)
+        return result
+
+    def on_event(self, event):
+        if event["type"] == "span":
+            self.record(event["name"], event["duration_s"], event.get("images", 1))
+
+    def summary(self):
+        stages = {}
+        ordered = [s for s in STAGES if s in self.latencies]
+        ordered += sorted(s for s in self.latencies if s not in STAGES)
+        for stage in ordered:
+            values = self.latencies[stage]
+            ms = np.asarray(values) * 1000
+            stages[stage] = {
+                "count": len(values),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "throughput_per_s": float(self.images[stage] / max(ms.sum() / 1000, 1e-9)),
+                "process_rss_mb": round(self.rss[stage], 1),
+            }
+        return stages
+
+
+# ==================================================
+# BENCHMARK RUN
+# ==================================================
+def list_images(image_dir, limit=None):
+    paths = sorted(
+        p for p in Path(image_dir).iterdir()
+        if p.suffix.lower() in IMAGE_EXTS
+    )
+    return paths[:limit] if limit else paths
+
+
+def run_benchmark(
+    model,
+    images,
+    conf_threshold=0.25,
+    warmup=2,
+    with_pdf=True,
+    batch_size=None
+):
+    """
+    Time the pipeline entry points over `images` (see module
+    docstring). Returns the report dict.
+    """
+    from src.pipeline import run_pipeline_image
+    from src.report_generator import generate_pdf_report
+
+    images = [str(path) for path in images]
+
+    def run_image(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        start = time.perf_counter()
+        result = run_pipeline_image(model, data, conf_threshold=conf_threshold, encode=".jpg")
+        return time.perf_counter() - start, [result]
+
+    def run_batch(paths):
+        start = time.perf_counter()
+        results = list(detect_batch(model, paths, conf_threshold=conf_threshold, batch_size=batch_size))
+        return time.perf_counter() - start, results
+
+    if batch_size:
+        run, chunks = run_batch, [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    else:
+        run, chunks = run_image, images
+
+    for chunk in chunks[:warmup]:
+        run(chunk)
+
+    track_memory()
+    timer = StageTimer()
+    was_enabled = telemetry.is_enabled()
+    if not was_enabled:
+        telemetry.enable(json_logs=False)
+    telemetry.add_hook(timer.on_event)
+
+    count = 0
+    rss_growth = 0.0
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, "report.pdf")
+            wall_start = time.perf_counter()
+
+            for chunk in chunks:
+                rss_before = current_rss_mb()
+                duration, results = run(chunk)
+                rss_growth = max(rss_growth, current_rss_mb() - rss_before)
+                timer.record("total", duration, len(results))
+                count += len(results)
+
+                if not with_pdf:
+                    continue
+                for result in results:
+                    if "annotated_image_bytes" not in result:
+                        result["annotated_image_bytes"], result["heatmap_bytes"] = timer.run(
+                            "encode",
+                            lambda: (encode_image(result["annotated_image"]), encode_image(result["heatmap_image"]))
+                        )
+                    timer.run(
+                        "pdf",
+                        generate_pdf_report,
+                        output_path=pdf_path,
+                        crack_percentage=result["crack_percentage"],
+                        risk_level=result["risk_level"],
+                        severity_score=result["severity_score"],
+                        engineer_name="benchmark",
+                        project_id="benchmark",
+                        annotated_image=result["annotated_image_bytes"],
+                        heatmap_image=result["heatmap_bytes"]
+                    )
+
+            wall_s = time.perf_counter() - wall_start
+    finally:
+        telemetry.remove_hook(timer.on_event)
+        if not was_enabled:
+            telemetry.disable()
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "mode": f"detect_batch (batch_size={batch_size})" if batch_size else "run_pipeline_image",
+        "images": count,
+        "wall_s": wall_s,
+        "throughput_per_s": count / wall_s if wall_s else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "max_call_rss_growth_mb": round(rss_growth, 1),
+        "stages": timer.summary(),
+    }
+
+
+# ==================================================
+# COMPARE
+# ==================================================
+def compare(current, baseline, tolerance=0.10):
+    """
+    List of regression messages: a stage whose p50/p95 latency grew,
+    or whose throughput dropped, by more than `tolerance`.
+    """
+    regressions = []
+
+    for stage, base in baseline.get("stages", {}).items():
+        cur = current.get("stages", {}).get(stage)
+        if cur is None:
+            continue
+
+        for metric in ("p50_ms", "p95_ms"):
+            if cur[metric] > base[metric] * (1 + tolerance):
+                growth = f"+{(cur[metric] / base[metric] - 1) * 100:.0f}%" if base[metric] else "from 0"
+                regressions.append(
+                    f"{stage}.{metric}: {base[metric]:.2f} -> {cur[metric]:.2f} ms ({growth})"
+                )
+
+        if cur["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{stage}.throughput_per_s: {base['throughput_per_s']:.2f} -> "
+                f"{cur['throughput_per_s']:.2f}"
+            )
+
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['images']} images, {report['throughput_per_s']:.2f} img/s, "
+          f"process peak RSS {report['peak_rss_mb']} MB, "
+          f"max growth per call {report.get('max_call_rss_growth_mb', 0.0)} MB")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'img/s':>10}{'proc RSS':>10}")
+    for stage, s in report["stages"].items():
+        rss = s.get("process_rss_mb", s.get("peak_rss_mb", 0.0))
+        print(f"{stage:<12}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+              f"{s['throughput_per_s']:>10.2f}{rss:>10.1f}")
+
+
+# ==================================================
+# CLI
+# ==================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StructScan AI stage benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="benchmark the pipeline")
+    run_p.add_argument("--images", default=str(DEFAULT_IMAGE_DIR))
+    run_p.add_argument("--limit", type=int, default=50)
+    run_p.add_argument("--conf", type=float, default=0.25)
+    run_p.add_argument("--warmup", type=int, default=2)
+    run_p.add_argument("--batch-size", type=int, default=None, help="time detect_batch in batches of N")
+    run_p.add_argument("--no-pdf", action="store_true")
+    run_p.add_argument("--output", default="bench_output.json")
+    run_p.add_argument("--baseline", help="also compare against this report")
+    run_p.add_argument("--tolerance", type=float, default=0.10)
+
+    cmp_p = sub.add_parser("compare", help="compare a report against a baseline")
+    cmp_p.add_argument("report")
+    cmp_p.add_argument("--baseline", required=True)
+    cmp_p.add_argument("--tolerance", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        from src.pipeline import load_models
+
+        report = run_benchmark(
+            load_models(warmup=True),
+            list_images(args.images, args.limit),
+            conf_threshold=args.conf,
+            warmup=args.warmup,
+            with_pdf=not args.no_pdf,
+            batch_size=args.batch_size
+        )
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print_report(report)
+        print(f"Saved: {args.output}")
+    else:
+        with open(args.report) as f:
+            report = json.load(f)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Content-addressed cache for run_pipeline results.
+
+Entries are keyed by the SHA-256 of the input image bytes, the hash of
+the model weights and the detection settings (conf_threshold, tiling).
+Each entry stores the metrics and detections plus the paths of the
+rendered artifacts, so a hit skips decoding, inference, heatmap and
+encoding entirely.
+
+Entries live in a small in-memory LRU backed by one JSON file per
+entry on disk, in a subdirectory per weights hash, so caches for
+different model versions can share one cache_dir. Disk usage is
+bounded by entry count and total bytes over the whole cache_dir (every
+weights hash, including those of models no longer in use), evicting
+least recently used entries first; entries of retired weights are
+never read again, so they are the first to go. The count and size are
+kept as running totals, so the directory is only scanned when a limit
+is crossed. When the weights file changes while a cache is in use,
+the entries computed with the old weights are dropped right away.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+
+# ==================================================
+# HASHING
+# ==================================================
+_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _weights_files(path):
+    """
+    The weights file itself, or every file of an exported model
+    directory (e.g. OpenVINO IR), in a stable order.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def weights_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    for file_path in _weights_files(path):
+        digest.update(file_digest(file_path).encode("ascii"))
+    return digest.hexdigest()
+
+
+# ==================================================
+# RESULT CACHE
+# ==================================================
+class ResultCache:
+    """
+    Two-level (memory + disk) LRU cache of pipeline results.
+
+    Only JSON-serialisable fields are stored; the annotated image is
+    re-read from its artifact path on a hit. Entries whose artifacts
+    have been deleted are treated as misses.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        weights_path: str,
+        memory_entries: int = 256,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        self.weights_path = weights_path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._weights_stat = None
+        self._weights_hash = None
+        self._entries_dir = None
+
+        # Running totals for _entries_dir; None until scanned
+        self._count = None
+        self._bytes = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ------------------------------
+    # Weights tracking
+    # ------------------------------
+    def weights_hash(self) -> str:
+        """
+        Hash of the current weights file. Re-hashed only when its
+        size or mtime changes; a change invalidates older entries.
+        """
+        signature = tuple(
+            (f, stat.st_size, stat.st_mtime_ns)
+            for f, stat in (
+                (f, os.stat(f)) for f in _weights_files(self.weights_path)
+            )
+        )
+
+        with self._lock:
+            if signature != self._weights_stat:
+                new_hash = weights_digest(self.weights_path)
+                if new_hash != self._weights_hash:
+                    self._use_weights(new_hash)
+                self._weights_stat = signature
+            return self._weights_hash
+
+    def _use_weights(self, weights_hash):
+        """
+        Switch to the entry directory of `weights_hash`, dropping the
+        one of the weights this cache used before.
+        """
+        if self._entries_dir is not None:
+            shutil.rmtree(self._entries_dir, ignore_errors=True)
+        self._memory.clear()
+
+        self._weights_hash = weights_hash
+        self._entries_dir = os.path.join(self.cache_dir, weights_hash[:16])
+        os.makedirs(self._entries_dir, exist_ok=True)
+        self._count = self._bytes = None
+
+    # ------------------------------
+    # Keys
+    # ------------------------------
+    def key(self, image_digest: str, conf_threshold: float, **options) -> str:
+        """
+        Cache key for an image digest (see file_digest) and the
+        detection settings that influence the result.
+        """
+        payload = json.dumps(
+            {
+                "image": image_digest,
+                "weights": self.weights_hash(),
+                "conf": round(float(conf_threshold), 6),
+                "options": options,
+            },
+            sort_keys=True,
+            default=str
+        )
+        return bytes_digest(payload.encode("utf-8"))
+
+    # ------------------------------
+    # Lookup / store
+    # ------------------------------
+    def get(self, key: str):
+        """
+        Returns the cached entry dict, or None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                path = self._path(key)
+                entry = self._read(path)
+                if entry is not None:
+                    self._remember(key, entry)
+                    _touch(path)
+
+            if entry is None or not _artifacts_exist(entry):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return dict(entry)
+
+    def put(self, key: str, entry: dict):
+        """
+        Stores a JSON-serialisable entry (metrics, detections and
+        artifact paths) and evicts old entries if over budget.
+        """
+        entry = dict(entry, weights_hash=self.weights_hash())
+        data = json.dumps(entry).encode("utf-8")
+
+        with self._lock:
+            self._remember(key, entry)
+
+            path = self._path(key)
+            self._totals()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = None
+
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if replaced is None:
+                self._count += 1
+            self._bytes += len(data) - (replaced or 0)
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """
+        Drop the entries of the current weights.
+        """
+        with self._lock:
+            self._memory.clear()
+            for path in self._entry_files():
+                self._remove(path)
+            self._count = self._bytes = None
+
+    # ------------------------------
+    # Internals
+    # ------------------------------
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        if self._entries_dir is None:
+            self.weights_hash()
+        return os.path.join(self._entries_dir, f"{key}.json")
+
+    def _entry_files(self):
+        if self._entries_dir is None:
+            self.weights_hash()
+        with os.scandir(self._entries_dir) as it:
+            return [e.path for e in it if e.name.endswith(".json")]
+
+    def _all_entry_files(self):
+        """
+        Entry files of every weights hash under cache_dir (and any
+        left at its top level by older versions of this cache).
+        """
+        paths = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.is_dir():
+                    try:
+                        with os.scandir(e.path) as sub:
+                            paths.extend(f.path for f in sub if f.name.endswith(".json"))
+                    except OSError:
+                        continue
+                elif e.name.endswith(".json"):
+                    paths.append(e.path)
+        return paths
+
+    def _scan(self):
+        """
+        (mtime, size, path) of every entry file under cache_dir, and
+        the running totals reset from them.
+        """
+        entries = []
+        for path in self._all_entry_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        self._count = len(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def _totals(self):
+        if self._count is None:
+            self._scan()
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, path):
+        key = os.path.splitext(os.path.basename(path))[0]
+        self._memory.pop(key, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """
+        Rescan (other caches and processes may share the directory)
+        and drop the least recently used entries down to 90% of the
+        limits, so the next scan is many puts away.
+        """
+        entries = self._scan()
+        if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        max_entries = int(self.max_entries * 0.9)
+        max_bytes = int(self.max_bytes * 0.9)
+
+        # Oldest (least recently used) first
+        entries.sort()
+        for _, size, path in entries:
+            if self._count <= max_entries and self._bytes <= max_bytes:
+                break
+            self._remove(path)
+            self._count -= 1
+            self._bytes -= size
+
+        # Directories of retired weights left empty by the eviction
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if path != self._entries_dir and os.path.isdir(path):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
+
+
+def _artifacts_exist(entry):
+    for key in ("annotated_image_path", "heatmap_path"):
+        path = entry.get(key)
+        if path and not os.path.exists(path):
+            return False
+    return True
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
@@ -0,0 +1,168 @@
+"""
+Near-duplicate detection for survey imagery.
+
+Burst and overlapping shots are collapsed before inference: every image
+gets a 64-bit difference hash (dHash) of a small grayscale thumbnail,
+and hashes are kept in a BK-tree so "is there an earlier image within
+N bits?" only visits a few nodes instead of every image seen so far.
+
+An image within `max_distance` bits of an earlier one is linked to
+that representative and reuses its result instead of going through the
+model (see `dedup` in pipeline.iter_pipeline_batch):
+
+    index = DuplicateIndex(max_distance=5)
+    representative = index.add(image_hash(path), position)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Bits (out of 64) two hashes may differ by and still be duplicates.
+# Burst frames of the same view are typically 0-4 apart; unrelated
+# concrete surfaces are usually > 20.
+DEFAULT_MAX_DISTANCE = 5
+
+HASH_SIZE = 8
+
+
+# ==================================================
+# PERCEPTUAL HASH
+# ==================================================
+def dhash(image, hash_size=HASH_SIZE) -> int:
+    """
+    Difference hash of a BGR or grayscale image: one bit per pair of
+    horizontally adjacent cells of a (hash_size + 1) x hash_size
+    thumbnail, set where brightness increases left to right.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_hash(source, hash_size=HASH_SIZE) -> int:
+    """
+    dHash of an image path, encoded bytes or decoded array. Files and
+    bytes are decoded at 1/8 resolution, which is all the hash needs.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        image = cv2.imread(str(source), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    else:
+        image = source
+
+    if image is None:
+        raise ValueError(f"Could not decode image for hashing: {source!r:.80}")
+    return dhash(image, hash_size)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# ==================================================
+# BK-TREE
+# ==================================================
+class BKTree:
+    """
+    Metric tree over Hamming distance. Each child edge is labelled
+    with its distance to the parent, so a radius-r query only follows
+    edges within [d - r, d + r] (triangle inequality).
+    """
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, item_hash: int, value):
+        node = (item_hash, value, {})
+        self.size += 1
+        if self._root is None:
+            self._root = node
+            return
+
+        current = self._root
+        while True:
+            distance = hamming(item_hash, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def find(self, item_hash: int, max_distance: int):
+        """
+        (distance, value) of every stored hash within `max_distance`,
+        closest first.
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_hash, value, children = stack.pop()
+            distance = hamming(item_hash, node_hash)
+            if distance <= max_distance:
+                matches.append((distance, value))
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class DuplicateIndex:
+    """
+    Running index of representative images. `add()` returns the
+    representative an image duplicates, or registers the image as a
+    new representative and returns None.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._tree = BKTree()
+        self.images = 0
+        self.duplicates = 0
+
+    def add(self, item_hash: int, value):
+        self.images += 1
+        matches = self._tree.find(item_hash, self.max_distance)
+        if matches:
+            self.duplicates += 1
+            return matches[0][1]
+        self._tree.add(item_hash, value)
+        return None
+
+    def stats(self):
+        return dedup_stats(self.images, self.duplicates)
+
+
+def dedup_stats(images, duplicates):
+    return {
+        "images": images,
+        "unique": images - duplicates,
+        "duplicates": duplicates,
+        "skipped_fraction": duplicates / images if images else 0.0,
+    }
+
+
+def summarize(results):
+    """
+    Skipped-work summary of pipeline results, where near-duplicates
+    carry a "duplicate_of" entry.
+    """
+    results = list(results)
+    duplicates = sum(1 for r in results if r.get("duplicate_of") is not None)
+    return dedup_stats(len(results), duplicates)
+
+
+def unique_results(results):
+    """
+    Results without their near-duplicates, for project-level statistics.
+    """
+    return [r for r in results if r.get("duplicate_of") is None]
@@ -1,117 +1,163 @@
+import hashlib
+import logging
 import os
+from itertools import islice
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from src import telemetry
+from src.inference import heatmap
+from src.inference.export import backend_model_path
+from src.inference.segmentation import crack_likelihood
+from src.inference.tiling import detect_tiled
+
+logger = logging.getLogger("structscan.detect")
 
 
 # ==================================================
 # LOAD MODEL
 # ==================================================
-def load_model(model_path: str):
+def load_model(model_path: str, backend: str = "torch", int8: bool = False):
     """
     Load YOLO crack detection model.
+
+    `backend` selects the runtime ("torch", "onnx" or "openvino");
+    non-torch backends load the export of `model_path` produced by
+    src/inference/export.py. All backends return the same ultralytics
+    results, so the rest of the pipeline is unchanged.
+
+    ultralytics (and torch with it) is imported here rather than at
+    module load, so importing the pipeline stays fast.
     """
+    model_path = backend_model_path(model_path, backend, int8)
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model file not found: {model_path}")
 
-    return YOLO(model_path)
+    from ultralytics import YOLO
+
+    return YOLO(model_path, task="detect")
 
 
 # ==================================================
-# DETECT CRACKS + GENERATE HEATMAP
+# ANALYSIS HELPERS
 # ==================================================
-def detect_and_save(
-    model,
-    image_path: str,
-    output_path: str,
-    conf_threshold: float = 0.25
-):
+def _extract_boxes(results, conf_threshold):
     """
-    Detect cracks, save annotated image, generate heatmap,
-    and return analysis results.
+    Collect boxes and confidences from YOLO results as whole arrays
+    and drop low-confidence boxes in one step.
 
     Returns:
-        annotated_image (np.ndarray)
-        crack_percentage (float)
-        severity_score (float)
-        risk_level (str)
-        heatmap_path (str)
+        boxes (np.ndarray, int32, N x 4) as x1, y1, x2, y2
+        scores (np.ndarray, float32, N)
     """
+    all_boxes = []
+    all_scores = []
 
-    # ------------------------------
-    # Load image
-    # ------------------------------
-    image = cv2.imread(image_path)
-    if image is None:
-        raise FileNotFoundError(f"Image not found: {image_path}")
+    for result in results:
+        if result.boxes is None or len(result.boxes) == 0:
+            continue
 
-    height, width = image.shape[:2]
-    total_area = height * width
+        boxes = result.boxes.cpu().numpy()
+        all_boxes.append(np.asarray(boxes.xyxy, dtype=np.float32))
+        all_scores.append(np.asarray(boxes.conf, dtype=np.float32))
 
-    # ------------------------------
-    # YOLO inference
-    # ------------------------------
-    results = model(image, conf=conf_threshold)
+    if not all_boxes:
+        return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
 
-    annotated = image.copy()
+    boxes = np.concatenate(all_boxes).reshape(-1, 4)
+    scores = np.concatenate(all_scores).reshape(-1)
 
-    detections = []
+    keep = scores >= conf_threshold
+    return boxes[keep].astype(np.int32), scores[keep]
 
-    # 🔥 Heatmap mask (single channel)
-    heatmap_mask = np.zeros((height, width), dtype=np.float32)
 
-    for result in results:
-        if result.boxes is None:
-            continue
+def _union_area(boxes, width, height):
+    """
+    Area covered by the union of boxes, so overlapping detections
+    are only counted once.
 
-        for box in result.boxes:
-            confidence = float(box.conf[0])
-            if confidence < conf_threshold:
-                continue
+    Box edges are compressed onto a grid of their unique coordinates
+    and coverage is rasterised there with a 2-D difference array. The
+    grid is never larger than the image itself.
+    """
+    if len(boxes) == 0:
+        return 0
 
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+    x1 = np.clip(boxes[:, 0], 0, width)
+    y1 = np.clip(boxes[:, 1], 0, height)
+    x2 = np.clip(boxes[:, 2], 0, width)
+    y2 = np.clip(boxes[:, 3], 0, height)
 
-            detections.append((x1, y1, x2, y2, confidence))
+    valid = (x2 > x1) & (y2 > y1)
+    if not valid.any():
+        return 0
+    x1, y1, x2, y2 = x1[valid], y1[valid], x2[valid], y2[valid]
 
-            # ------------------------------
-            # Draw bounding box
-            # ------------------------------
-            cv2.rectangle(
-                annotated,
-                (x1, y1),
-                (x2, y2),
-                (0, 255, 0),
-                2
-            )
+    xs = np.unique(np.concatenate([x1, x2]))
+    ys = np.unique(np.concatenate([y1, y2]))
 
-            label_y = max(y1 - 8, 15)
-            cv2.putText(
-                annotated,
-                f"Crack {confidence:.2f}",
-                (x1, label_y),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (0, 255, 0),
-                1,
-                cv2.LINE_AA
-            )
+    ix1 = np.searchsorted(xs, x1)
+    ix2 = np.searchsorted(xs, x2)
+    iy1 = np.searchsorted(ys, y1)
+    iy2 = np.searchsorted(ys, y2)
+
+    diff = np.zeros((len(ys), len(xs)), dtype=np.int32)
+    np.add.at(diff, (iy1, ix1), 1)
+    np.add.at(diff, (iy1, ix2), -1)
+    np.add.at(diff, (iy2, ix1), -1)
+    np.add.at(diff, (iy2, ix2), 1)
+
+    covered = diff.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+
+    cell_area = np.outer(np.diff(ys), np.diff(xs))
+    return int(cell_area[covered].sum())
+
+
+def _annotate(image, boxes, scores):
+    """
+    Draw boxes and confidence labels on a copy of the image.
+    """
+    annotated = image.copy()
+
+    for (x1, y1, x2, y2), confidence in zip(boxes.tolist(), scores.tolist()):
+        cv2.rectangle(
+            annotated,
+            (x1, y1),
+            (x2, y2),
+            (0, 255, 0),
+            2
+        )
+
+        label_y = max(y1 - 8, 15)
+        cv2.putText(
+            annotated,
+            f"Crack {confidence:.2f}",
+            (x1, label_y),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (0, 255, 0),
+            1,
+            cv2.LINE_AA
+        )
 
-            # ------------------------------
-            # 🔥 Heatmap accumulation
-            # ------------------------------
-            heatmap_mask[y1:y2, x1:x2] += confidence
+    return annotated
+
+
+def _metrics(boxes, width, height):
+    """
+    Crack percentage (union of boxes), severity score and risk level.
+    """
+    total_area = height * width
 
     # ------------------------------
-    # Crack percentage calculation
+    # Crack percentage calculation (union of boxes)
     # ------------------------------
-    crack_area = sum(
-        max(0, x2 - x1) * max(0, y2 - y1)
-        for x1, y1, x2, y2, _ in detections
-    )
+    crack_area = _union_area(boxes, width, height)
 
     crack_percentage = (
         (crack_area / total_area) * 100
-        if detections else 0.0
+        if len(boxes) else 0.0
     )
 
     # ------------------------------
@@ -126,38 +172,562 @@ def detect_and_save(
     else:
         risk_level = "High"
 
-    # ------------------------------
-    # 🔥 Heatmap generation
-    # ------------------------------
-    heatmap_norm = cv2.normalize(
-        heatmap_mask, None, 0, 255, cv2.NORM_MINMAX
-    ).astype(np.uint8)
+    return crack_percentage, severity_score, risk_level
 
-    heatmap_color = cv2.applyColorMap(
-        heatmap_norm, cv2.COLORMAP_JET
-    )
 
-    heatmap_overlay = cv2.addWeighted(
-        image, 0.6, heatmap_color, 0.4, 0
-    )
+def _heatmap_overlay(image, boxes, scores):
+    """
+    🔥 Confidence-weighted box density blended over the image.
+    """
+    height, width = image.shape[:2]
+    density = heatmap.box_density(boxes, scores, width, height)
+    return heatmap.render_overlay(image, density), density
 
-    # ------------------------------
-    # Save outputs
-    # ------------------------------
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    heatmap_path = output_path.replace(".jpg", "_heatmap.jpg")
+# Artifacts _build_outputs can produce; pass a subset (or ()) to skip
+# the rest, e.g. artifacts=() for metrics-only runs
+ARTIFACTS = ("annotated", "heatmap")
 
-    cv2.imwrite(output_path, annotated)
-    cv2.imwrite(heatmap_path, heatmap_overlay)
 
-    # ------------------------------
-    # Return results
-    # ------------------------------
+def _analyse(image, boxes, scores, artifacts=ARTIFACTS):
+    """
+    Turn the detected boxes of one image into crack metrics and the
+    requested artifacts: the annotated image, and the heatmap overlay
+    with the (reduced-resolution) density it was rendered from.
+    Artifacts that were not requested are None.
+    """
+    height, width = image.shape[:2]
+    annotated = heatmap_overlay = heatmap_density = None
+
+    with telemetry.span("postprocess", detections=len(boxes)):
+        if "annotated" in artifacts:
+            annotated = _annotate(image, boxes, scores)
+
+        crack_percentage, severity_score, risk_level = _metrics(boxes, width, height)
+
+    if "heatmap" in artifacts:
+        with telemetry.span("heatmap"):
+            heatmap_overlay, heatmap_density = _heatmap_overlay(image, boxes, scores)
+
     return (
         annotated,
         crack_percentage,
         severity_score,
         risk_level,
-        heatmap_path
-    )
\ No newline at end of file
+        heatmap_overlay,
+        heatmap_density
+    )
+
+
+def _detection_list(boxes, scores):
+    """
+    JSON-friendly [x1, y1, x2, y2, confidence] rows.
+    """
+    return [
+        [x1, y1, x2, y2, round(confidence, 4)]
+        for (x1, y1, x2, y2), confidence in zip(boxes.tolist(), scores.tolist())
+    ]
+
+
+def heatmap_path_for(output_path):
+    """
+    "<name>_heatmap<ext>" next to the annotated image, for any extension.
+    """
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_heatmap{ext}"
+
+
+def _write_images(jobs, quality):
+    with telemetry.span("save"):
+        for path, image in jobs:
+            ext = os.path.splitext(path)[1]
+            if not cv2.imwrite(path, image, encode_params(ext, quality)):
+                raise ValueError(f"Could not write {path}")
+
+    if telemetry.is_enabled():
+        telemetry.count("bytes_written", sum(os.path.getsize(path) for path, _ in jobs))
+
+
+def _report_write_error(future):
+    error = future.exception()
+    if error is not None:
+        telemetry.count("artifact_write_errors")
+        logger.error("Failed to write artifacts: %s", error, exc_info=error)
+
+
+def _save_outputs(output_path, annotated, heatmap_overlay, quality=None, writer=None):
+    """
+    Write the annotated image and heatmap next to each other, in the
+    format given by the extension of `output_path`. Artifacts that are
+    None are skipped.
+
+    With a `writer` (a concurrent.futures executor) encoding and
+    writing run there instead of on the caller's thread; the paths are
+    returned straight away and the files appear once the job is done.
+
+    Returns (annotated_path, heatmap_path), None for skipped artifacts.
+    """
+    annotated_path = output_path if annotated is not None else None
+    heatmap_path = heatmap_path_for(output_path) if heatmap_overlay is not None else None
+
+    jobs = [
+        (path, image)
+        for path, image in ((annotated_path, annotated), (heatmap_path, heatmap_overlay))
+        if path is not None
+    ]
+
+    if jobs:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if writer is not None:
+            writer.submit(_write_images, jobs, quality).add_done_callback(_report_write_error)
+        else:
+            _write_images(jobs, quality)
+
+    return annotated_path, heatmap_path
+
+
+def _no_detections():
+    return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+
+def _passes_prefilter(image, prefilter):
+    """
+    False if the classical-CV pre-filter (segmentation.py) rates the
+    image as clearly clean, so the model can be skipped.
+    """
+    if prefilter is None:
+        return True
+    with telemetry.span("prefilter"):
+        candidate = crack_likelihood(image) >= prefilter
+    if not candidate:
+        telemetry.count("prefilter_skipped")
+    return candidate
+
+
+def _infer(model, image, conf_threshold, tile_size, tile_overlap, tile_batch_size):
+    with telemetry.span("inference", tiled=bool(tile_size)):
+        if tile_size:
+            return detect_tiled(
+                model,
+                image,
+                conf_threshold=conf_threshold,
+                tile_size=tile_size,
+                overlap=tile_overlap,
+                batch_size=tile_batch_size
+            )
+
+        results = model(image, conf=conf_threshold)
+        return _extract_boxes(results, conf_threshold)
+
+
+def _build_outputs(
+    image,
+    boxes,
+    scores,
+    output_path=None,
+    artifacts=ARTIFACTS,
+    quality=None,
+    writer=None
+):
+    """
+    Analyse one image's boxes, building only the requested `artifacts`,
+    and, if `output_path` is given, write them to disk.
+    """
+    (
+        annotated,
+        crack_percentage,
+        severity_score,
+        risk_level,
+        heatmap_overlay,
+        heatmap_density
+    ) = _analyse(image, boxes, scores, artifacts)
+
+    annotated_path = heatmap_path = None
+    if output_path:
+        annotated_path, heatmap_path = _save_outputs(
+            output_path, annotated, heatmap_overlay, quality=quality, writer=writer
+        )
+
+    telemetry.count("images_processed")
+    telemetry.count("detections", len(boxes))
+
+    return {
+        "annotated_image": annotated,
+        "heatmap_image": heatmap_overlay,
+        "heatmap_density": heatmap_density,
+        "annotated_image_path": annotated_path,
+        "heatmap_path": heatmap_path,
+        "crack_percentage": float(crack_percentage),
+        "severity_score": float(severity_score),
+        "risk_level": str(risk_level),
+        "detections": _detection_list(boxes, scores)
+    }
+
+
+# ==================================================
+# IN-MEMORY DECODE / ENCODE
+# ==================================================
+def decode_image(data):
+    """
+    Decode encoded image bytes (JPEG/PNG/...) into a BGR array.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image bytes")
+    return image
+
+
+# Encoder setting `quality` maps to, per output format
+_QUALITY_FLAGS = {
+    ".jpg": cv2.IMWRITE_JPEG_QUALITY,
+    ".jpeg": cv2.IMWRITE_JPEG_QUALITY,
+    ".webp": cv2.IMWRITE_WEBP_QUALITY,
+    ".png": cv2.IMWRITE_PNG_COMPRESSION,
+}
+
+
+def encode_params(ext: str, quality: int = None) -> list:
+    """
+    OpenCV encoder flags for `ext`: `quality` is 0-100 for JPEG and
+    WebP, and the compression level 0-9 for PNG. None keeps OpenCV's
+    defaults.
+    """
+    flag = _QUALITY_FLAGS.get(ext.lower())
+    if flag is None:
+        raise ValueError(f"Unsupported image format '{ext}', expected one of {tuple(_QUALITY_FLAGS)}")
+    return [] if quality is None else [flag, int(quality)]
+
+
+def encode_image(image, ext: str = ".jpg", quality: int = None) -> bytes:
+    """
+    Encode a BGR array to bytes in the format given by `ext`.
+    """
+    ok, buffer = cv2.imencode(ext, image, encode_params(ext, quality))
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buffer.tobytes()
+
+
+# Preview pyramid levels: name and long side in pixels (None = original)
+PREVIEW_LEVELS = (("thumb", 320), ("screen", 1280), ("full", None))
+
+
+def preview_pyramid(image, ext: str = ".jpg", full: bytes = None, quality: int = None) -> dict:
+    """
+    Encoded previews of one image, {level: bytes} for PREVIEW_LEVELS.
+    Levels at least as large as the image share the full-size bytes;
+    pass `full` if the image has already been encoded.
+    """
+    height, width = image.shape[:2]
+    long_side = max(height, width)
+
+    if full is None:
+        full = encode_image(image, ext, quality)
+
+    pyramid = {}
+    for level, side in PREVIEW_LEVELS:
+        if side is None or side >= long_side:
+            pyramid[level] = full
+            continue
+        scale = side / long_side
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        pyramid[level] = encode_image(cv2.resize(image, size, interpolation=cv2.INTER_AREA), ext, quality)
+    return pyramid
+
+
+def pick_preview(pyramid: dict, max_side: int = None) -> bytes:
+    """
+    Smallest level whose long side is at least `max_side` pixels
+    (the full image when `max_side` is None).
+    """
+    for level, side in PREVIEW_LEVELS:
+        if side is None or (max_side is not None and side >= max_side):
+            return pyramid[level]
+    return pyramid["full"]
+
+
+# ==================================================
+# DETECT CRACKS + GENERATE HEATMAP
+# ==================================================
+def detect_and_save(
+    model,
+    image_path: str,
+    output_path: str,
+    conf_threshold: float = 0.25,
+    tile_size: int = None,
+    tile_overlap: float = 0.2,
+    tile_batch_size: int = 8,
+    return_detections: bool = False,
+    artifacts=ARTIFACTS,
+    quality: int = None,
+    writer=None,
+    prefilter: float = None
+):
+    """
+    Detect cracks, save annotated image, generate heatmap,
+    and return analysis results.
+
+    When `tile_size` is set, the image is split into overlapping
+    tiles that are run at native resolution (see tiling.py); use
+    this for high-resolution facade and drone imagery.
+
+    The output format follows the extension of `output_path` (.jpg,
+    .jpeg, .webp or .png) with the given `quality` (see
+    encode_params). Only the `artifacts` listed are built and saved;
+    pass a `writer` executor to encode and write them off this thread.
+
+    With `prefilter` set to a crack-likelihood threshold (see
+    segmentation.load_threshold), images scoring below it skip the
+    model and get a "no cracks" result.
+
+    Returns:
+        annotated_image (np.ndarray, None if not requested)
+        crack_percentage (float)
+        severity_score (float)
+        risk_level (str)
+        heatmap_path (str, None if not requested)
+        detections (list of [x1, y1, x2, y2, conf]),
+            only if return_detections is True
+    """
+
+    # ------------------------------
+    # Load image
+    # ------------------------------
+    with telemetry.span("decode"):
+        image = cv2.imread(image_path)
+    if image is None:
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    # ------------------------------
+    # YOLO inference + save outputs
+    # ------------------------------
+    outputs = detect_image(
+        model,
+        image,
+        output_path=output_path,
+        conf_threshold=conf_threshold,
+        tile_size=tile_size,
+        tile_overlap=tile_overlap,
+        tile_batch_size=tile_batch_size,
+        artifacts=artifacts,
+        quality=quality,
+        writer=writer,
+        prefilter=prefilter
+    )
+
+    # ------------------------------
+    # Return results
+    # ------------------------------
+    analysis = (
+        outputs["annotated_image"],
+        outputs["crack_percentage"],
+        outputs["severity_score"],
+        outputs["risk_level"],
+        outputs["heatmap_path"]
+    )
+
+    if return_detections:
+        return analysis + (outputs["detections"],)
+    return analysis
+
+
+def detect_image(
+    model,
+    image,
+    output_path: str = None,
+    conf_threshold: float = 0.25,
+    tile_size: int = None,
+    tile_overlap: float = 0.2,
+    tile_batch_size: int = 8,
+    artifacts=ARTIFACTS,
+    quality: int = None,
+    writer=None,
+    prefilter: float = None
+):
+    """
+    Detect cracks on an in-memory image without touching the disk.
+
+    `image` is a decoded BGR array or encoded image bytes. Outputs
+    are written only when `output_path` is given (see detect_and_save
+    for `artifacts`, `quality`, `writer` and `prefilter`).
+
+    Returns a dict with:
+        annotated_image, heatmap_image (np.ndarray)
+        heatmap_density (np.ndarray, float32, reduced resolution;
+            see heatmap.py)
+        annotated_image_path, heatmap_path (str or None)
+        crack_percentage, severity_score (float)
+        risk_level (str)
+        detections (list of [x1, y1, x2, y2, conf])
+    """
+    if not isinstance(image, np.ndarray):
+        image = decode_image(image)
+
+    if _passes_prefilter(image, prefilter):
+        boxes, scores = _infer(
+            model,
+            image,
+            conf_threshold,
+            tile_size,
+            tile_overlap,
+            tile_batch_size
+        )
+    else:
+        boxes, scores = _no_detections()
+
+    return _build_outputs(image, boxes, scores, output_path, artifacts, quality, writer)
+
+
+# ==================================================
+# BATCHED DETECTION
+# ==================================================
+def _batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, batch_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def batch_output_path(output_dir, source, index, image_format=".jpg"):
+    """
+    Where detect_batch writes the annotated image of the `index`-th
+    input (None without an `output_dir`). Paths are named after the
+    file plus a short hash of its full path, so same-named images from
+    different folders do not overwrite each other.
+    """
+    if output_dir is None:
+        return None
+    if isinstance(source, (str, os.PathLike)):
+        source = os.path.abspath(source)
+        digest = hashlib.sha1(source.encode("utf-8", "surrogateescape")).hexdigest()[:8]
+        stem = f"{os.path.splitext(os.path.basename(source))[0]}_{digest}"
+    else:
+        stem = f"image_{index:05d}"
+    return os.path.join(output_dir, f"{stem}{image_format}")
+
+
+def load_image(source):
+    """
+    BGR array of an image path, encoded bytes or decoded array.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(source)
+
+    image = cv2.imread(str(source))
+    if image is None:
+        raise FileNotFoundError(f"Image not found: {source}")
+    return image
+
+
+def _infer_batch(model, frames, conf_threshold, tile_size, tile_overlap, batch_size):
+    if tile_size:
+        return [
+            detect_tiled(
+                model,
+                image,
+                conf_threshold=conf_threshold,
+                tile_size=tile_size,
+                overlap=tile_overlap,
+                batch_size=batch_size
+            )
+            for image in frames
+        ]
+
+    return [
+        _extract_boxes([result], conf_threshold)
+        for result in model(frames, conf=conf_threshold)
+    ]
+
+
+def detect_batch(
+    model,
+    images,
+    output_dir: str = None,
+    conf_threshold: float = 0.25,
+    batch_size: int = 8,
+    tile_size: int = None,
+    tile_overlap: float = 0.2,
+    output_paths=None,
+    artifacts=ARTIFACTS,
+    image_format: str = ".jpg",
+    quality: int = None,
+    writer=None,
+    prefilter: float = None
+):
+    """
+    Detect cracks on many images, running one YOLO call per batch.
+
+    `images` may be a list or any iterator of image paths, encoded
+    image bytes and/or decoded BGR arrays; it is consumed lazily, so
+    only one batch of decoded images is held in memory at a time.
+
+    With `tile_size` set, each image is instead run through tiled
+    inference and `batch_size` applies to its tiles.
+
+    Outputs are written to `output_dir`, named after the input file
+    and a short hash of its path (or image_<index> otherwise; see
+    batch_output_path) with the `image_format` extension,
+    unless `output_paths` gives an explicit path per image. With
+    neither, nothing is written.
+
+    `artifacts` is a tuple applied to every image, or a list with one
+    tuple per image (like `output_paths`); use () for metrics only.
+    See detect_and_save for `quality`, `writer` and `prefilter`; only
+    images passing the pre-filter are sent to the model.
+
+    Yields, in input order, the dict detect_image returns.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+
+    paths = iter(output_paths) if output_paths is not None else None
+    per_image_artifacts = iter(artifacts) if isinstance(artifacts, list) else None
+
+    index = 0
+    for chunk in _batched(images, batch_size):
+        # ------------------------------
+        # Decode batch
+        # ------------------------------
+        with telemetry.span("decode", images=len(chunk)):
+            frames = [load_image(source) for source in chunk]
+
+        # ------------------------------
+        # YOLO inference (one call per batch)
+        # ------------------------------
+        candidates = [i for i, frame in enumerate(frames) if _passes_prefilter(frame, prefilter)]
+
+        detections = [_no_detections()] * len(frames)
+        if candidates:
+            with telemetry.span("inference", images=len(candidates), tiled=bool(tile_size)):
+                inferred = _infer_batch(
+                    model,
+                    [frames[i] for i in candidates],
+                    conf_threshold,
+                    tile_size,
+                    tile_overlap,
+                    batch_size
+                )
+            for i, boxes_scores in zip(candidates, inferred):
+                detections[i] = boxes_scores
+
+        for source, image, (boxes, scores) in zip(chunk, frames, detections):
+            if paths is not None:
+                output_path = next(paths)
+            else:
+                output_path = batch_output_path(output_dir, source, index, image_format)
+            index += 1
+
+            yield _build_outputs(
+                image,
+                boxes,
+                scores,
+                output_path,
+                next(per_image_artifacts) if per_image_artifacts is not None else artifacts,
+                quality,
+                writer
+            )
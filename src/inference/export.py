@@ -0,0 +1,221 @@
+"""
+Export the crack detector to CPU inference runtimes.
+
+    python -m src.inference.export --format onnx
+    python -m src.inference.export --format onnx --int8
+    python -m src.inference.export --format openvino --int8
+
+Exports are written next to the weights with the names
+backend_model_path() expects, so the pipeline can switch backends with
+STRUCTSCAN_BACKEND=onnx|openvino (and STRUCTSCAN_INT8=1) without code
+changes. ultralytics runs every backend behind the same YOLO
+interface, so result dicts are identical across backends.
+
+INT8 models are statically quantised, calibrated on images from
+data/processed/val. ONNX export needs `onnx` and `onnxruntime`;
+OpenVINO export needs `openvino` (and `nncf` for INT8).
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_WEIGHTS = PROJECT_ROOT / "models" / "crack.pt"
+DEFAULT_CALIB_DIR = PROJECT_ROOT / "data" / "processed" / "val" / "images"
+
+BACKENDS = ("torch", "onnx", "openvino")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+# ==================================================
+# BACKEND PATHS
+# ==================================================
+def backend_model_path(weights_path: str, backend: str = "torch", int8: bool = False) -> str:
+    """
+    Location of the exported model for a backend.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    weights = Path(weights_path)
+    if backend == "torch":
+        return str(weights)
+
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        return str(weights.with_name(f"{weights.stem}{suffix}.onnx"))
+    return str(weights.with_name(f"{weights.stem}{suffix}_openvino_model"))
+
+
+# ==================================================
+# CALIBRATION DATA
+# ==================================================
+def calibration_images(calib_dir, limit=200, seed=0):
+    """
+    A reproducible random sample of up to `limit` calibration images.
+    """
+    paths = sorted(
+        p for p in Path(calib_dir).iterdir()
+        if p.suffix.lower() in IMAGE_EXTS
+    )
+    if not paths:
+        raise FileNotFoundError(f"No calibration images found in {calib_dir}")
+
+    random.Random(seed).shuffle(paths)
+    return paths[:limit]
+
+
+def _letterbox_tensor(path, imgsz):
+    """
+    Same preprocessing as ultralytics: letterbox to imgsz, BGR->RGB,
+    HWC->CHW, scale to [0, 1].
+    """
+    image = cv2.imread(str(path))
+    if image is None:
+        raise ValueError(f"Failed to read image: {path}")
+
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return tensor[None]
+
+
+# ==================================================
+# EXPORTERS
+# ==================================================
+def export_onnx(weights_path, imgsz=640, int8=False, calib_dir=DEFAULT_CALIB_DIR, calib_limit=200):
+    from ultralytics import YOLO
+
+    exported = YOLO(str(weights_path)).export(
+        format="onnx", imgsz=imgsz, dynamic=True, simplify=True
+    )
+    target = backend_model_path(weights_path, "onnx")
+    if os.path.abspath(exported) != os.path.abspath(target):
+        shutil.move(exported, target)
+
+    if not int8:
+        return target
+
+    return quantize_onnx_int8(
+        target,
+        backend_model_path(weights_path, "onnx", int8=True),
+        imgsz=imgsz,
+        calib_dir=calib_dir,
+        calib_limit=calib_limit
+    )
+
+
+def quantize_onnx_int8(fp32_path, int8_path, imgsz=640, calib_dir=DEFAULT_CALIB_DIR, calib_limit=200):
+    """
+    Static QDQ INT8 quantisation with ONNX Runtime, calibrated on
+    letterboxed validation images.
+    """
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static
+    )
+
+    input_name = onnxruntime.InferenceSession(
+        fp32_path, providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(calibration_images(calib_dir, calib_limit))
+
+        def get_next(self):
+            path = next(self._paths, None)
+            if path is None:
+                return None
+            return {input_name: _letterbox_tensor(path, imgsz)}
+
+    quantize_static(
+        fp32_path,
+        int8_path,
+        _Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    return int8_path
+
+
+def export_openvino(weights_path, imgsz=640, int8=False, calib_dir=DEFAULT_CALIB_DIR, calib_limit=200):
+    """
+    OpenVINO IR export; with int8, ultralytics calibrates through NNCF
+    on the `val` split of a dataset yaml pointing at calib_dir.
+    """
+    from ultralytics import YOLO
+
+    kwargs = {"format": "openvino", "imgsz": imgsz, "dynamic": True}
+
+    tmp_dir = None
+    if int8:
+        tmp_dir = tempfile.mkdtemp()
+        calib_list = os.path.join(tmp_dir, "calib.txt")
+        with open(calib_list, "w") as f:
+            f.writelines(f"{p}\n" for p in calibration_images(calib_dir, calib_limit))
+
+        data_yaml = os.path.join(tmp_dir, "calib.yaml")
+        with open(data_yaml, "w") as f:
+            f.write(f"path: {tmp_dir}\ntrain: {calib_list}\nval: {calib_list}\nnames:\n  0: crack\n")
+
+        kwargs.update(int8=True, data=data_yaml)
+
+    try:
+        exported = YOLO(str(weights_path)).export(**kwargs)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    target = backend_model_path(weights_path, "openvino", int8=int8)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.move(exported, target)
+    return target
+
+
+# ==================================================
+# CLI
+# ==================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the crack model for CPU runtimes")
+    parser.add_argument("--weights", default=str(DEFAULT_WEIGHTS))
+    parser.add_argument("--format", choices=("onnx", "openvino"), default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="static INT8 quantisation")
+    parser.add_argument("--calib-dir", default=str(DEFAULT_CALIB_DIR))
+    parser.add_argument("--calib-limit", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    exporter = export_onnx if args.format == "onnx" else export_openvino
+    path = exporter(
+        args.weights,
+        imgsz=args.imgsz,
+        int8=args.int8,
+        calib_dir=args.calib_dir,
+        calib_limit=args.calib_limit
+    )
+    print(f"Exported: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,109 @@
+"""
+Heatmap engine shared by detect.py, the UI and reports.
+
+Boxes are accumulated into a confidence-weighted density map with a
+2-D difference array: four corner updates per box and one cumulative
+sum per axis, so the cost is O(boxes + pixels) however many boxes
+overlap. The density is computed at a reduced resolution (long side at
+most `max_side`) and only the coloured overlay is upsampled to the
+image size for display.
+
+    density = box_density(boxes, scores, width, height)
+    overlay = render_overlay(image, density)
+"""
+
 import cv2
 import numpy as np
 
-def generate_heatmap(image, detections, alpha=0.5):
+# Long side of the density map; heatmaps are smooth, so 24 MP images
+# do not need a full-resolution accumulator
+MAX_SIDE = 1024
+
+
+def density_scale(width, height, max_side=MAX_SIDE):
+    if not max_side:
+        return 1.0
+    return min(1.0, max_side / max(width, height))
+
+
+# ==================================================
+# ACCUMULATE
+# ==================================================
+def box_density(boxes, scores, width, height, max_side=MAX_SIDE):
     """
-    Create heatmap overlay from YOLO detections
+    Sum of box confidences covering each cell, as a float32 array of
+    shape (ceil(height * s), ceil(width * s)) with s = density_scale().
+
+    boxes are x1, y1, x2, y2 in image pixels; a box covers
+    [y1:y2, x1:x2] like a NumPy slice.
+    """
+    scale = density_scale(width, height, max_side)
+    dw = max(1, int(np.ceil(width * scale)))
+    dh = max(1, int(np.ceil(height * scale)))
+
+    diff = np.zeros((dh + 1, dw + 1), dtype=np.float32)
+    if len(boxes) == 0:
+        return diff[:dh, :dw]
+
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    x1 = np.clip(np.floor(boxes[:, 0] * scale), 0, dw).astype(np.intp)
+    y1 = np.clip(np.floor(boxes[:, 1] * scale), 0, dh).astype(np.intp)
+    x2 = np.clip(np.ceil(boxes[:, 2] * scale), 0, dw).astype(np.intp)
+    y2 = np.clip(np.ceil(boxes[:, 3] * scale), 0, dh).astype(np.intp)
+
+    valid = (x2 > x1) & (y2 > y1)
+    x1, y1, x2, y2, scores = x1[valid], y1[valid], x2[valid], y2[valid], scores[valid]
+
+    np.add.at(diff, (y1, x1), scores)
+    np.add.at(diff, (y1, x2), -scores)
+    np.add.at(diff, (y2, x1), -scores)
+    np.add.at(diff, (y2, x2), scores)
+
+    return diff.cumsum(axis=0).cumsum(axis=1)[:dh, :dw]
+
+
+# ==================================================
+# RENDER
+# ==================================================
+def colorize(density, normalize="minmax"):
     """
-    heatmap = np.zeros(image.shape[:2], dtype=np.float32)
+    JET-coloured BGR image of a density map. "minmax" stretches the
+    density to the full colour range; "clip" maps [0, 1] directly.
+    """
+    if normalize == "clip":
+        scaled = np.uint8(255 * np.clip(density, 0, 1))
+    else:
+        scaled = cv2.normalize(density, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+
 
-    for det in detections:
-        x1, y1, x2, y2, conf = det
-        heatmap[y1:y2, x1:x2] += conf
+def render_overlay(image, density, alpha=0.4, normalize="minmax", blur=0):
+    """
+    Blend the coloured density over `image`, upsampling it to the
+    image size. `blur` is a Gaussian kernel size in image pixels,
+    applied at the density's resolution.
+    """
+    height, width = image.shape[:2]
 
-    heatmap = np.clip(heatmap, 0, 1)
-    heatmap = cv2.GaussianBlur(heatmap, (31, 31), 0)
+    if blur:
+        ksize = max(1, int(round(blur * density.shape[1] / width))) | 1
+        density = cv2.GaussianBlur(density, (ksize, ksize), 0)
 
-    heatmap_color = cv2.applyColorMap(
-        np.uint8(255 * heatmap),
-        cv2.COLORMAP_JET
-    )
+    color = colorize(density, normalize)
+    if color.shape[:2] != (height, width):
+        color = cv2.resize(color, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    return cv2.addWeighted(image, 1 - alpha, color, alpha, 0)
+
+
+def generate_heatmap(image, detections, alpha=0.5):
+    """
+    Create heatmap overlay from YOLO detections
+    """
+    height, width = image.shape[:2]
+    detections = np.asarray(detections, dtype=np.float32).reshape(-1, 5)
 
-    overlay = cv2.addWeighted(image, 1 - alpha, heatmap_color, alpha, 0)
-    return overlay
\ No newline at end of file
+    density = np.clip(box_density(detections[:, :4], detections[:, 4], width, height), 0, 1)
+    return render_overlay(image, density, alpha=alpha, normalize="clip", blur=31)
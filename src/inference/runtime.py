@@ -0,0 +1,83 @@
+"""
+Runtime setup for CPU inference: thread sizing and model warm-up.
+
+torch is only imported when threads are actually configured, so
+importing this module stays cheap.
+"""
+
+import os
+import time
+
+import numpy as np
+
+
+# ==================================================
+# CPU DISCOVERY
+# ==================================================
+def available_cpus() -> int:
+    """
+    CPUs this process may use, honouring CPU affinity and the cgroup
+    v2 quota (cpu.max) that container runtimes set.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cpus)
+
+
+# ==================================================
+# TORCH THREADS
+# ==================================================
+def configure_threads(num_threads: int = None, num_interop_threads: int = None):
+    """
+    Set torch intra-op / inter-op thread counts.
+
+    Defaults come from STRUCTSCAN_NUM_THREADS and
+    STRUCTSCAN_NUM_INTEROP_THREADS, else all available CPUs for
+    intra-op and one inter-op thread (a single inference stream).
+
+    Returns the (intra_op, inter_op) counts in effect.
+    """
+    import torch
+
+    if num_threads is None:
+        num_threads = int(os.environ.get("STRUCTSCAN_NUM_THREADS", 0)) or available_cpus()
+    if num_interop_threads is None:
+        num_interop_threads = int(os.environ.get("STRUCTSCAN_NUM_INTEROP_THREADS", 0)) or 1
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(num_interop_threads)
+    except RuntimeError:
+        # Can only be set once, before any inter-op parallel work
+        pass
+
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+# ==================================================
+# WARM-UP
+# ==================================================
+def warmup_model(model, imgsz: int = 640, runs: int = 1) -> float:
+    """
+    Run dummy inference at the serving image size so lazy graph and
+    kernel initialisation happens before the first real request.
+
+    Returns the warm-up time in seconds.
+    """
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        model(dummy, imgsz=imgsz, verbose=False)
+    return time.perf_counter() - start
@@ -0,0 +1,234 @@
+"""
+Classical-CV crack pre-filter.
+
+A cheap crack-likelihood score computed on a downscaled grayscale copy
+of the image, used to skip YOLO on frames that are clearly clean:
+
+1. black-hat morphology picks out thin structures darker than their
+   surroundings (cracks are dark ridges on concrete)
+2. the response is thresholded at a contrast relative to the image's
+   own spread, so texture and lighting do not dominate
+3. connected components that are too short to be a crack are dropped
+
+The score is the fraction of the (downscaled) frame covered by the
+remaining elongated dark ridges. Frames scoring below the threshold
+go straight to a "no cracks" result (see `prefilter` in detect.py).
+
+The threshold is calibrated on labelled images so that at least
+`recall` of the images with cracks are still sent to the model. It is
+fitted on the pooled --fit splits with a safety margin (a stricter miss
+rate than the target) and its recall is reported on held-out splits:
+
+    python -m src.inference.segmentation --recall 0.99 --fit train --holdout val test
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = PROJECT_ROOT / "data" / "processed"
+DEFAULT_VAL_DIR = DATA_DIR / "val"
+CALIBRATION_PATH = PROJECT_ROOT / "models" / "prefilter.json"
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# Long side the score is computed at
+SCORE_SIZE = 256
+# Used when no calibration file exists: skip nothing, since an
+# uncalibrated threshold cannot promise any recall.
+DEFAULT_THRESHOLD = 0.0
+
+
+# ==================================================
+# CRACK LIKELIHOOD
+# ==================================================
+def crack_likelihood(
+    image,
+    size=SCORE_SIZE,
+    kernel_size=17,
+    min_contrast=12.0,
+    min_length=0.08
+):
+    """
+    Fraction of the downscaled frame covered by elongated dark ridges.
+
+    `min_contrast` is the minimum black-hat response in gray levels,
+    `min_length` the minimum component extent as a fraction of `size`.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    height, width = gray.shape[:2]
+    scale = size / max(height, width)
+    if scale < 1:
+        gray = cv2.resize(
+            gray,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+    blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, kernel)
+
+    # Relative to the frame's own black-hat spread, so rough but
+    # uniform texture does not count as ridges
+    threshold = max(min_contrast, float(blackhat.mean() + 3 * blackhat.std()))
+    ridges = (blackhat > threshold).astype(np.uint8)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ridges, connectivity=8)
+    stats = stats[1:]
+    extent = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    long_enough = extent >= min_length * max(gray.shape[:2])
+
+    return float(stats[long_enough, cv2.CC_STAT_AREA].sum()) / gray.size
+
+
+def load_threshold(path=CALIBRATION_PATH):
+    """
+    Calibrated threshold (STRUCTSCAN_PREFILTER_THRESHOLD overrides it),
+    or DEFAULT_THRESHOLD if no calibration has been run.
+    """
+    override = os.environ.get("STRUCTSCAN_PREFILTER_THRESHOLD")
+    if override:
+        return float(override)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(json.load(f)["threshold"])
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_THRESHOLD
+
+
+# ==================================================
+# CALIBRATION
+# ==================================================
+# Full-frame placeholder label (see generate_labels.py): not a real
+# annotation, so such images count as unlabelled
+PLACEHOLDER_LABEL = "0 0.5 0.5 1.0 1.0"
+
+
+def _has_cracks(label_path):
+    try:
+        with open(label_path, "r") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return None
+    if lines == [PLACEHOLDER_LABEL]:
+        return None
+    return bool(lines)
+
+
+def score_split(split_dir=DEFAULT_VAL_DIR):
+    """
+    Crack-likelihood scores for a split, as (positives, negatives):
+    images whose label file has boxes, and images with an empty one.
+    Images without a label file, or with the full-frame placeholder,
+    are ignored.
+    """
+    images_dir = Path(split_dir) / "images"
+    labels_dir = Path(split_dir) / "labels"
+    positives, negatives = [], []
+
+    for path in sorted(images_dir.iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTS:
+            continue
+        has_cracks = _has_cracks(labels_dir / f"{path.stem}.txt")
+        if has_cracks is None:
+            continue
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        (positives if has_cracks else negatives).append(crack_likelihood(image))
+
+    return np.asarray(positives), np.asarray(negatives)
+
+
+def calibrate(
+    fit_dirs=(DATA_DIR / "train",),
+    holdout_dirs=(DATA_DIR / "val", DATA_DIR / "test"),
+    recall=0.99,
+    margin=0.5,
+    output_path=CALIBRATION_PATH
+):
+    """
+    Pick the highest threshold that passes `recall` of the positive
+    images of the pooled `fit_dirs`, aiming at `margin` x the allowed
+    miss rate so it still holds on unseen images. Saves it with the
+    recall on every split (held-out ones separately) and the share of
+    negative images it would skip.
+
+    Raises ValueError without crack-free (empty-label) images: with
+    only positives, any threshold at or below the lowest score has
+    perfect recall, so neither the threshold nor its recall means
+    anything.
+    """
+    scores = {Path(d).name: score_split(d) for d in fit_dirs}
+    positives = np.concatenate([p for p, _ in scores.values()])
+    negatives = np.concatenate([n for _, n in scores.values()])
+    if len(positives) == 0:
+        raise ValueError(f"No labelled crack images found in {', '.join(map(str, fit_dirs))}")
+    if len(negatives) == 0:
+        raise ValueError(
+            f"No crack-free (empty-label) images found in {', '.join(map(str, fit_dirs))}; "
+            "the pre-filter cannot be calibrated without negatives"
+        )
+
+    threshold = float(np.quantile(positives, (1 - recall) * margin, method="lower"))
+
+    def split_recall(split_positives):
+        return float((split_positives >= threshold).mean()) if len(split_positives) else None
+
+    holdout = {Path(d).name: score_split(d)[0] for d in holdout_dirs}
+
+    report = {
+        "threshold": threshold,
+        "target_recall": recall,
+        "margin": margin,
+        "recall": split_recall(positives),
+        "split_recall": {name: split_recall(p) for name, (p, _) in scores.items()},
+        "holdout_recall": {name: split_recall(p) for name, p in holdout.items()},
+        "positives": int(len(positives)),
+        "negatives": int(len(negatives)),
+        "negatives_skipped": float((negatives < threshold).mean()),
+    }
+
+    os.makedirs(os.path.dirname(str(output_path)) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the crack pre-filter threshold")
+    parser.add_argument("--fit", nargs="+", default=["train"], help="splits to fit on (pooled)")
+    parser.add_argument("--holdout", nargs="+", default=["val", "test"], help="splits to report recall on")
+    parser.add_argument("--base", default=str(DATA_DIR))
+    parser.add_argument("--recall", type=float, default=0.99)
+    parser.add_argument("--margin", type=float, default=0.5, help="fit at this fraction of the allowed miss rate")
+    parser.add_argument("--output", default=str(CALIBRATION_PATH))
+    args = parser.parse_args()
+
+    try:
+        report = calibrate(
+            [os.path.join(args.base, split) for split in args.fit],
+            [os.path.join(args.base, split) for split in args.holdout],
+            args.recall,
+            args.margin,
+            args.output
+        )
+    except ValueError as e:
+        print(f"Not calibrated: {e}")
+        raise SystemExit(1)
+    print(json.dumps(report, indent=2))
+
+    for name, split_recall in report["holdout_recall"].items():
+        if split_recall is None:
+            print(f"{name}: no labelled crack images; recall not measured.")
+        elif split_recall < args.recall:
+            print(f"{name}: recall {split_recall:.3f} is below the target; consider a smaller --margin.")
+    if report["threshold"] <= 0:
+        print("Threshold is 0: at this recall the pre-filter will not skip any image.")
@@ -0,0 +1,131 @@
+import numpy as np
+
+
+# ==================================================
+# TILE GRID
+# ==================================================
+def tile_origins(length: int, tile_size: int, overlap: float):
+    """
+    Start offsets along one axis so that tiles of `tile_size` with the
+    given fractional overlap cover [0, length). The last tile is
+    shifted back to end exactly at the border.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+
+    if length <= tile_size:
+        return [0]
+
+    stride = max(1, int(tile_size * (1 - overlap)))
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+
+def iter_tiles(image, tile_size: int, overlap: float):
+    """
+    Yields (x0, y0, tile) for every tile of the image.
+    Tiles are views into `image`, so nothing is copied here.
+    """
+    height, width = image.shape[:2]
+    for y0 in tile_origins(height, tile_size, overlap):
+        for x0 in tile_origins(width, tile_size, overlap):
+            yield x0, y0, image[y0:y0 + tile_size, x0:x0 + tile_size]
+
+
+# ==================================================
+# BOX MERGING
+# ==================================================
+def nms(boxes, scores, iou_threshold: float = 0.5):
+    """
+    Greedy non-maximum suppression.
+    Returns indices of the kept boxes, highest score first.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    boxes = boxes.astype(np.float32)
+    x1, y1, x2, y2 = boxes.T
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+
+    order = np.argsort(-scores)
+    keep = []
+
+    while order.size:
+        i = order[0]
+        keep.append(i)
+
+        rest = order[1:]
+        inter_w = np.maximum(
+            0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        )
+        inter_h = np.maximum(
+            0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        )
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+# ==================================================
+# TILED INFERENCE
+# ==================================================
+def detect_tiled(
+    model,
+    image,
+    conf_threshold: float = 0.25,
+    tile_size: int = 640,
+    overlap: float = 0.2,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5
+):
+    """
+    Run YOLO over overlapping tiles of a large image at native
+    resolution and merge the boxes across tile seams with NMS.
+
+    Tiles are streamed through the model `batch_size` at a time, so
+    apart from the input image itself only one batch of tiles is
+    held in memory.
+
+    Returns:
+        boxes (np.ndarray, int32, N x 4) in full-image coordinates
+        scores (np.ndarray, float32, N)
+    """
+    # Imported here to avoid a circular import with detect.py
+    from src.inference.detect import _extract_boxes
+
+    all_boxes = []
+    all_scores = []
+
+    def flush(batch):
+        results = model(
+            [np.ascontiguousarray(tile) for _, _, tile in batch],
+            conf=conf_threshold,
+            imgsz=tile_size
+        )
+        for (x0, y0, _), result in zip(batch, results):
+            boxes, scores = _extract_boxes([result], conf_threshold)
+            if len(boxes):
+                all_boxes.append(boxes + np.array([x0, y0, x0, y0]))
+                all_scores.append(scores)
+
+    batch = []
+    for tile in iter_tiles(image, tile_size, overlap):
+        batch.append(tile)
+        if len(batch) == batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if not all_boxes:
+        return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+    boxes = np.concatenate(all_boxes).astype(np.int32)
+    scores = np.concatenate(all_scores)
+
+    keep = nms(boxes, scores, iou_threshold)
+    return boxes[keep], scores[keep]
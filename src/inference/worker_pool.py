@@ -0,0 +1,498 @@
+"""
+Multi-process inference worker pool.
+
+One YOLO instance per process cannot keep a many-core server busy, and
+pickling decoded 12 MP frames to other processes costs about as much as
+the inference it offloads. WorkerPool instead starts N worker
+processes, each with its own model and its own share of the CPUs
+(OpenMP/BLAS thread counts set in its environment at spawn, torch
+threads for the torch backend and CPU affinity pinned per worker), and
+passes frames through shared memory:
+
+- every worker owns a ring of fixed-size frame slots in one
+  multiprocessing.shared_memory block
+- the parent decodes, takes a free slot (from any worker, so idle
+  workers get the next frame), copies the pixels in and sends only
+  (task id, slot, shape) over the worker's queue
+- the worker runs the pre-filter, inference, post-processing and
+  artifact writes on the shared frame and sends back the small result
+  dict (metrics, detections, paths); the slot is then free again
+
+Results are returned in submission order. Frames larger than a slot
+are pickled as a fallback.
+
+    with WorkerPool(MODEL_PATH, workers=8) as pool:
+        for result in iter_pipeline_batch(pool, paths, "results/survey"):
+            ...
+
+    python -m src.inference.worker_pool --workers 1 2 4 8 --limit 64
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from multiprocessing import get_context, shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from src.inference.detect import ARTIFACTS, batch_output_path, detect_image, load_image
+from src.inference.runtime import available_cpus
+
+# One 12 MP BGR frame per slot
+DEFAULT_SLOT_BYTES = 4000 * 3000 * 3
+DEFAULT_SLOTS_PER_WORKER = 2
+
+_RESULT_ARRAYS = ("annotated_image", "heatmap_image", "heatmap_density")
+
+
+# ==================================================
+# WORKER PROCESS
+# ==================================================
+# Thread-pool sizes OpenMP / MKL / OpenBLAS read once, when the library
+# loads; a spawned worker imports numpy and cv2 while unpickling its
+# target, so they have to be in its environment from the start
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_spawn_lock = threading.Lock()
+
+
+def _start_with_threads(process, threads):
+    """
+    Start `process` with THREAD_ENV_VARS set to `threads` (spawned
+    children copy the parent's environment), then restore them.
+    """
+    with _spawn_lock:
+        saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+        os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+        try:
+            process.start()
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+
+def _pin_worker(threads, cpus, backend):
+    """
+    Limit this process to `threads` compute threads on `cpus`. torch
+    is only touched for the torch backend.
+    """
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError):
+            pass
+
+    import cv2
+    cv2.setNumThreads(1)
+
+    if backend == "torch":
+        from src.inference.runtime import configure_threads
+        configure_threads(threads, 1)
+
+
+def _worker_main(index, config, block_name, tasks, results):
+    """
+    Load the model, then serve tasks until a None task arrives.
+    """
+    try:
+        _pin_worker(config["threads"], config["cpus"], config["backend"])
+
+        from src.inference.detect import load_model
+        from src.inference.runtime import warmup_model
+
+        model = load_model(config["model_path"], backend=config["backend"], int8=config["int8"])
+        if config["warmup"]:
+            warmup_model(model, imgsz=config["imgsz"])
+        # Spawned workers share the parent's resource tracker, so the
+        # parent's unlink in close() is the only cleanup needed
+        block = shared_memory.SharedMemory(name=block_name)
+    except Exception as e:
+        results.put(("failed", index, None, repr(e)))
+        return
+
+    results.put(("ready", index, None, None))
+
+    slot_bytes = config["slot_bytes"]
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        task_id, slot, shape, dtype, frame, options = task
+        try:
+            if frame is None:
+                frame = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=slot * slot_bytes)
+            results.put(("done", index, task_id, _run_task(model, frame, options)))
+        except Exception as e:
+            results.put(("error", index, task_id, repr(e)))
+        finally:
+            frame = None
+
+    try:
+        block.close()
+    except BufferError:
+        pass
+
+
+def _run_task(model, frame, options):
+    outputs = detect_image(
+        model,
+        frame,
+        output_path=options["output_path"],
+        conf_threshold=options["conf_threshold"],
+        tile_size=options["tile_size"],
+        tile_overlap=options["tile_overlap"],
+        tile_batch_size=options["batch_size"],
+        artifacts=options["artifacts"],
+        quality=options["quality"],
+        prefilter=options["prefilter"]
+    )
+    return {k: v for k, v in outputs.items() if k not in _RESULT_ARRAYS}
+
+
+# ==================================================
+# POOL
+# ==================================================
+class WorkerPool:
+    """
+    N model processes fed through shared-memory frame rings.
+
+    `threads_per_worker` defaults to the available CPUs divided by
+    `workers`; each worker is also pinned to its own CPUs when there
+    are enough. Use as a context manager, or call close().
+    """
+
+    def __init__(
+        self,
+        model_path,
+        workers=None,
+        threads_per_worker=None,
+        backend="torch",
+        int8=False,
+        slot_bytes=DEFAULT_SLOT_BYTES,
+        slots_per_worker=DEFAULT_SLOTS_PER_WORKER,
+        decode_workers=None,
+        warmup=True,
+        imgsz=640,
+        startup_timeout=300
+    ):
+        cpus = available_cpus()
+        self.workers = workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self.slot_bytes = slot_bytes
+        self.decode_workers = decode_workers or min(8, cpus)
+
+        try:
+            cpu_ids = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            cpu_ids = []
+        pin = len(cpu_ids) >= self.workers * self.threads_per_worker
+
+        context = get_context("spawn")
+        self._results = context.Queue()
+        self._free = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._task_ids = count()
+        self._closed = False
+
+        self._blocks, self._tasks, self._processes = [], [], []
+        try:
+            for index in range(self.workers):
+                block = shared_memory.SharedMemory(create=True, size=slot_bytes * slots_per_worker)
+                tasks = context.Queue()
+                t = self.threads_per_worker
+                config = {
+                    "model_path": str(model_path),
+                    "backend": backend,
+                    "int8": int8,
+                    "threads": t,
+                    "cpus": cpu_ids[index * t:(index + 1) * t] if pin else None,
+                    "slot_bytes": slot_bytes,
+                    "warmup": warmup,
+                    "imgsz": imgsz,
+                }
+                process = context.Process(
+                    target=_worker_main,
+                    args=(index, config, block.name, tasks, self._results),
+                    name=f"inference-{index}",
+                    daemon=True
+                )
+                self._blocks.append(block)
+                self._tasks.append(tasks)
+                self._processes.append(process)
+                _start_with_threads(process, t)
+
+                for slot in range(slots_per_worker):
+                    self._free.put((index, slot))
+
+            self._wait_ready(startup_timeout)
+        except BaseException:
+            self.close()
+            raise
+
+        self._collector = threading.Thread(target=self._collect, name="pool-results", daemon=True)
+        self._collector.start()
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            try:
+                status, index, _, error = self._results.get(timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"Only {ready} of {self.workers} workers started")
+            if status == "failed":
+                raise RuntimeError(f"Worker {index} failed to start: {error}")
+            ready += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        for tasks, process in zip(self._tasks, self._processes):
+            if process.is_alive():
+                tasks.put(None)
+        for process in self._processes:
+            if process.pid is None:
+                # Never started (startup failed part-way)
+                continue
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+        self._fail_pending(lambda _: True, RuntimeError("Worker pool closed"))
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------
+    # Results
+    # ------------------------------
+    def _collect(self):
+        """
+        Resolve futures as workers report back; fail the tasks of any
+        worker that died.
+        """
+        last_check = time.monotonic()
+        while not self._closed:
+            if time.monotonic() - last_check > 0.5:
+                last_check = time.monotonic()
+                dead = {i for i, p in enumerate(self._processes) if not p.is_alive()}
+                if dead and not self._closed:
+                    self._fail_pending(
+                        lambda worker: worker in dead,
+                        RuntimeError(f"Inference worker(s) {sorted(dead)} exited")
+                    )
+
+            try:
+                status, index, task_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._pending_lock:
+                future, _, slot = self._pending.pop(task_id, (None, None, None))
+            if future is None:
+                continue
+            self._free.put((index, slot))
+            if status == "done":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Worker {index}: {payload}"))
+
+    def _fail_pending(self, match, error):
+        with self._pending_lock:
+            failed = [
+                (task_id, future)
+                for task_id, (future, worker, _) in self._pending.items()
+                if match(worker)
+            ]
+            for task_id, _ in failed:
+                del self._pending[task_id]
+        for _, future in failed:
+            future.set_exception(error)
+
+    # ------------------------------
+    # Submit
+    # ------------------------------
+    def _take_slot(self):
+        """
+        (worker, slot) of a free slot on a live worker. Slots of dead
+        workers are dropped; raises once no worker is left.
+        """
+        while True:
+            try:
+                index, slot = self._free.get(timeout=0.5)
+            except queue.Empty:
+                if self._closed:
+                    raise RuntimeError("Worker pool is closed")
+                if not any(process.is_alive() for process in self._processes):
+                    raise RuntimeError("All inference workers exited")
+                continue
+            if self._processes[index].is_alive():
+                return index, slot
+
+    def submit(
+        self,
+        image,
+        output_path=None,
+        conf_threshold=0.25,
+        tile_size=None,
+        tile_overlap=0.2,
+        batch_size=8,
+        artifacts=ARTIFACTS,
+        quality=None,
+        prefilter=None
+    ) -> Future:
+        """
+        Queue one decoded BGR frame; blocks while every slot is busy.
+        The future resolves to a detect_image-style dict without the
+        image arrays (artifacts are written by the worker).
+        """
+        if self._closed:
+            raise RuntimeError("Worker pool is closed")
+
+        index, slot = self._take_slot()
+        image = np.ascontiguousarray(image)
+
+        frame = None
+        if image.nbytes <= self.slot_bytes:
+            buffer = self._blocks[index].buf
+            view = np.ndarray(image.shape, dtype=image.dtype, buffer=buffer, offset=slot * self.slot_bytes)
+            view[...] = image
+            del view
+        else:
+            frame = image
+
+        options = {
+            "output_path": output_path,
+            "conf_threshold": conf_threshold,
+            "tile_size": tile_size,
+            "tile_overlap": tile_overlap,
+            "batch_size": batch_size,
+            "artifacts": tuple(artifacts),
+            "quality": quality,
+            "prefilter": prefilter,
+        }
+
+        future = Future()
+        task_id = next(self._task_ids)
+        with self._pending_lock:
+            self._pending[task_id] = (future, index, slot)
+        self._tasks[index].put((task_id, slot, image.shape, image.dtype.str, frame, options))
+        return future
+
+    def detect_batch(
+        self,
+        images,
+        output_dir=None,
+        conf_threshold=0.25,
+        batch_size=8,
+        tile_size=None,
+        tile_overlap=0.2,
+        output_paths=None,
+        artifacts=ARTIFACTS,
+        image_format=".jpg",
+        quality=None,
+        writer=None,
+        prefilter=None
+    ):
+        """
+        detect.detect_batch on the pool: same arguments and output
+        naming, results yielded in input order. Images are decoded
+        ahead on `decode_workers` threads; `writer` is unused since
+        workers write their own artifacts.
+        """
+        paths = iter(output_paths) if output_paths is not None else None
+        per_image_artifacts = iter(artifacts) if isinstance(artifacts, list) else None
+        # Decoded frames waiting for a slot; the slots bound the rest
+        lookahead = 2 * self.decode_workers
+
+        with ThreadPoolExecutor(self.decode_workers, thread_name_prefix="pool-decode") as decoder:
+            decoding = deque()
+            submitted = deque()
+
+            def submit_next():
+                decoded, output_path, image_artifacts = decoding.popleft()
+                submitted.append(self.submit(
+                    decoded.result(),
+                    output_path,
+                    conf_threshold=conf_threshold,
+                    tile_size=tile_size,
+                    tile_overlap=tile_overlap,
+                    batch_size=batch_size,
+                    artifacts=image_artifacts,
+                    quality=quality,
+                    prefilter=prefilter
+                ))
+
+            for index, source in enumerate(images):
+                if paths is not None:
+                    output_path = next(paths)
+                else:
+                    output_path = batch_output_path(output_dir, source, index, image_format)
+                image_artifacts = next(per_image_artifacts) if per_image_artifacts is not None else artifacts
+
+                decoding.append((decoder.submit(load_image, source), output_path, image_artifacts))
+                if len(decoding) >= lookahead:
+                    submit_next()
+                while submitted and submitted[0].done():
+                    yield submitted.popleft().result()
+
+            while decoding:
+                submit_next()
+                while submitted and submitted[0].done():
+                    yield submitted.popleft().result()
+            while submitted:
+                yield submitted.popleft().result()
+
+
+# ==================================================
+# SCALING BENCHMARK
+# ==================================================
+def _scaling_run(model_path, paths, workers, backend, int8):
+    with WorkerPool(model_path, workers=workers, backend=backend, int8=int8) as pool:
+        start = time.perf_counter()
+        for _ in pool.detect_batch(paths, artifacts=()):
+            pass
+        return len(paths) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from src.benchmark import DEFAULT_IMAGE_DIR, list_images
+    from src.pipeline import BACKEND, INT8, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Measure worker pool throughput scaling")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--images", default=str(DEFAULT_IMAGE_DIR))
+    parser.add_argument("--limit", type=int, default=64)
+    args = parser.parse_args()
+
+    paths = [str(p) for p in list_images(Path(args.images), args.limit)]
+    baseline = None
+    print(f"{'workers':>8}{'img/s':>10}{'speedup':>10}")
+    for workers in args.workers:
+        rate = _scaling_run(MODEL_PATH, paths, workers, BACKEND, INT8)
+        baseline = baseline or rate / workers
+        print(f"{workers:>8}{rate:>10.2f}{rate / baseline:>10.2f}")
@@ -0,0 +1,373 @@
+"""
+Folder inspection CLI.
+
+Streams every image under a directory tree through the batched
+pipeline (pipeline.iter_pipeline_batch), with decoding and artifact
+writing running alongside the model:
+
+    walk -> decode pool -> iter_pipeline_batch -> writer
+            (threads)      (model, post-           (one JSONL record
+                            processing; encoding    per image, in
+                            on the write pool)      walk order)
+
+Decoding runs up to `queue_size` images ahead on a thread pool, and
+encoding and writing the artifacts on another (OpenCV releases the GIL
+for both), so cores stay busy while the model runs, and the bounded
+read-ahead keeps memory flat however large the folder is.
+
+Progress is checkpointed next to the JSONL output, starting with an
+empty checkpoint when the output is created. After a crash, running
+the same command again resumes after the last checkpoint:
+
+    python -m src.inspect_folder survey/ --output survey.jsonl --artifacts-dir results/survey
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+
+import cv2
+
+from src.inference.detect import ARTIFACTS
+from src.pipeline import iter_pipeline_batch
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+_RECORD_KEYS = (
+    "crack_percentage",
+    "severity_score",
+    "risk_level",
+    "detections",
+    "annotated_image_path",
+    "heatmap_path",
+)
+
+# ==================================================
+# DIRECTORY WALK
+# ==================================================
+def iter_images(root):
+    """
+    Relative paths of the images under `root`, in a stable order.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTS):
+                yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+# ==================================================
+# CHECKPOINT
+# ==================================================
+def checkpoint_path_for(output_path):
+    return f"{output_path}.ckpt"
+
+
+def _write_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _resume(output_path, settings):
+    """
+    Set of images already recorded in `output_path`. Records after the
+    last checkpoint (possibly cut off mid-line) are truncated away and
+    redone. Raises ValueError if the checkpoint was made with other
+    settings.
+    """
+    checkpoint_path = checkpoint_path_for(output_path)
+    if not os.path.exists(checkpoint_path):
+        if os.path.exists(output_path):
+            raise ValueError(f"{output_path} exists without a checkpoint; use --restart to overwrite it")
+        return set()
+    if not os.path.exists(output_path):
+        raise ValueError(f"{output_path} is missing for {checkpoint_path}; use --restart to start over")
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint["settings"] != settings:
+        raise ValueError(
+            f"{checkpoint_path} was written with different settings; "
+            "use --restart to start over"
+        )
+
+    done = set()
+    with open(output_path, "r+b") as f:
+        f.truncate(checkpoint["offset"])
+        f.seek(0)
+        for line in f:
+            done.add(json.loads(line)["image"])
+    return done
+
+
+# ==================================================
+# STAGES
+# ==================================================
+def _read_image(path):
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not decode {path}")
+    return image
+
+
+def _decode_ahead(root, images, pool, window, order, output_paths, options):
+    """
+    Decoded images in walk order, keeping up to `window` decodes in
+    flight on `pool`. Every image is appended to `order` as
+    (rel, error); only the ones that decoded are yielded, with their
+    artifact path appended to `output_paths`.
+    """
+    images = iter(images)
+    in_flight = deque()
+
+    def fill():
+        for rel in islice(images, window - len(in_flight)):
+            in_flight.append((rel, pool.submit(_read_image, os.path.join(root, rel))))
+
+    fill()
+    while in_flight:
+        rel, future = in_flight.popleft()
+        fill()
+        error = future.exception()
+        order.append((rel, error))
+        if error is None:
+            output_paths.append(_artifact_path(options["artifacts_dir"], rel, options["image_format"]))
+            yield future.result()
+
+
+def _drain(items):
+    """
+    Lazily yield from a deque that is filled while being consumed.
+    """
+    while items:
+        yield items.popleft()
+
+
+class _TrackedWriter:
+    """
+    Write pool for the pipeline's artifacts that remembers pending
+    writes, so a checkpoint never covers images whose files are not
+    on disk yet.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._pool.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def wait(self):
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+
+
+def _artifact_path(artifacts_dir, rel, image_format):
+    if artifacts_dir is None:
+        return None
+    return os.path.join(artifacts_dir, os.path.splitext(rel)[0] + image_format)
+
+
+def _record(rel, result):
+    return {"image": rel, **{key: result[key] for key in _RECORD_KEYS}}
+
+
+# ==================================================
+# INSPECT
+# ==================================================
+def inspect_folder(
+    model,
+    root,
+    output_path,
+    artifacts_dir=None,
+    batch_size=8,
+    conf_threshold=0.25,
+    tile_size=None,
+    tile_overlap=0.2,
+    image_format=".jpg",
+    quality=None,
+    prefilter=None,
+    decode_workers=None,
+    post_workers=None,
+    queue_size=None,
+    checkpoint_every=200,
+    restart=False
+):
+    """
+    Inspect every image under `root`, appending one JSON record per
+    image to `output_path`. Artifacts are written under
+    `artifacts_dir` (mirroring the folder tree) when given; otherwise
+    only metrics are computed.
+
+    Unless `restart` is set, images recorded before the last
+    checkpoint are skipped. Images that fail to decode get an "error"
+    record; a model failure stops the run, checkpointed after the
+    last recorded image.
+
+    Returns a stats dict.
+    """
+    cpus = os.cpu_count() or 2
+    decode_workers = decode_workers or min(8, cpus)
+    post_workers = post_workers or min(8, cpus)
+    queue_size = queue_size or 2 * batch_size
+
+    settings = {
+        "root": os.path.abspath(root),
+        "artifacts_dir": os.path.abspath(artifacts_dir) if artifacts_dir else None,
+        "conf_threshold": conf_threshold,
+        "tile_size": tile_size,
+        "tile_overlap": tile_overlap,
+        "image_format": image_format,
+        "quality": quality,
+        "prefilter": prefilter,
+    }
+    options = dict(settings, artifacts_dir=artifacts_dir)
+
+    checkpoint_path = checkpoint_path_for(output_path)
+    if restart:
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    done = _resume(output_path, settings)
+    pending = (rel for rel in iter_images(root) if rel not in done)
+
+    stats = {"processed": 0, "failed": 0, "resumed": len(done)}
+    start = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    with ThreadPoolExecutor(decode_workers, thread_name_prefix="decode") as decode_pool, \
+            ThreadPoolExecutor(post_workers, thread_name_prefix="write") as write_pool, \
+            open(output_path, "a", encoding="utf-8") as out:
+        writer = _TrackedWriter(write_pool)
+
+        def checkpoint():
+            writer.wait()
+            out.flush()
+            os.fsync(out.fileno())
+            _write_checkpoint(checkpoint_path, {"settings": settings, "offset": out.tell()})
+
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            stats["failed" if "error" in record else "processed"] += 1
+
+        def write_failed():
+            # Images that failed to decode, up to the next decoded one
+            while order and order[0][1] is not None:
+                rel, error = order.popleft()
+                write({"image": rel, "error": str(error)})
+
+        # A crash before the first periodic checkpoint still resumes
+        checkpoint()
+
+        order, output_paths = deque(), deque()
+        results = iter_pipeline_batch(
+            model,
+            _decode_ahead(root, pending, decode_pool, queue_size, order, output_paths, options),
+            artifacts_dir,
+            batch_size=batch_size,
+            conf_threshold=conf_threshold,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            artifacts=ARTIFACTS if artifacts_dir else (),
+            image_format=image_format,
+            quality=quality,
+            writer=writer,
+            prefilter=prefilter,
+            output_paths=_drain(output_paths)
+        )
+
+        try:
+            since_checkpoint = 0
+            for result in results:
+                write_failed()
+                rel, _ = order.popleft()
+                write(_record(rel, result))
+
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    checkpoint()
+                    since_checkpoint = 0
+                    elapsed = time.perf_counter() - start
+                    print(f"{stats['processed'] + stats['failed']} images, "
+                          f"{(stats['processed'] + stats['failed']) / elapsed:.1f} img/s")
+            write_failed()
+        finally:
+            # Keep what was recorded so an aborted run can resume
+            checkpoint()
+
+    stats["elapsed_s"] = round(time.perf_counter() - start, 2)
+    stats["images_per_s"] = round((stats["processed"] + stats["failed"]) / max(stats["elapsed_s"], 1e-9), 2)
+    return stats
+
+
+# ==================================================
+# CLI
+# ==================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect every image in a folder tree")
+    parser.add_argument("folder")
+    parser.add_argument("--output", required=True, help="JSONL file, one record per image")
+    parser.add_argument("--artifacts-dir", help="write annotated images and heatmaps here")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--tile-size", type=int, default=None)
+    parser.add_argument("--tile-overlap", type=float, default=0.2)
+    parser.add_argument("--format", default=".jpg", help="artifact format: .jpg, .png or .webp")
+    parser.add_argument("--quality", type=int, default=None)
+    parser.add_argument("--prefilter", action="store_true", help="skip clearly clean images (see segmentation.py)")
+    parser.add_argument("--decode-workers", type=int, default=None)
+    parser.add_argument("--post-workers", type=int, default=None)
+    parser.add_argument("--checkpoint-every", type=int, default=200)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    from src.inference.segmentation import load_threshold
+    from src.pipeline import load_models
+
+    try:
+        stats = inspect_folder(
+            load_models(warmup=True),
+            args.folder,
+            args.output,
+            artifacts_dir=args.artifacts_dir,
+            batch_size=args.batch_size,
+            conf_threshold=args.conf,
+            tile_size=args.tile_size,
+            tile_overlap=args.tile_overlap,
+            image_format=args.format,
+            quality=args.quality,
+            prefilter=load_threshold() if args.prefilter else None,
+            decode_workers=args.decode_workers,
+            post_workers=args.post_workers,
+            checkpoint_every=args.checkpoint_every,
+            restart=args.restart
+        )
+    except ValueError as e:
+        print(e)
+        return 1
+
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+Thread-safe registry of the project's models.
+
+Models are registered by name and version (e.g. "crack" / "train5")
+and loaded on first use. Every caller asking for the same model shares
+one instance, and concurrent first requests wait for a single load.
+Loaded models are kept in an LRU under a memory budget. When a new
+model would exceed it, the least recently used models that no caller
+is leasing are dropped first.
+
+Each name has an active version, used when no version is given.
+swap() loads the new weights completely before switching the active
+version under the lock, so requests see either the old or the new
+model, never a half-loaded one. The old instance is released once
+nothing leases it and it falls out of the LRU, so A/B-ing two crack
+models costs at most both sets of weights, within the budget.
+
+    registry = default_registry()
+    with registry.lease("crack", "train5") as model:
+        ...
+    registry.swap("crack", "crack_retrain")
+
+Memory use is estimated as MEMORY_FACTOR x the size of the weights on
+disk, unless given explicitly at register().
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.cache import _weights_files
+from src.inference.export import backend_model_path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+MODELS_DIR = PROJECT_ROOT / "models"
+RUNS_DIR = PROJECT_ROOT / "runs" / "detect"
+
+MEMORY_BUDGET = int(os.environ.get("STRUCTSCAN_MODEL_MEMORY_MB", "2048")) * 1024 * 1024
+
+# Loaded size relative to the weights on disk (fp16 checkpoints are
+# expanded to fp32, plus framework overhead)
+MEMORY_FACTOR = 2.0
+
+ModelSpec = namedtuple("ModelSpec", "name version path loader memory_bytes")
+
+
+# ==================================================
+# LOADERS
+# ==================================================
+def load_yolo(path, backend="torch", int8=False):
+    from src.inference.detect import load_model
+    return load_model(str(path), backend=backend, int8=int8)
+
+
+def load_keras(path):
+    """
+    Keras .h5 models (U-Net segmentation, EfficientNet severity);
+    TensorFlow is only imported when one is requested.
+    """
+    from tensorflow import keras
+    return keras.models.load_model(str(path), compile=False)
+
+
+LOADERS = {
+    "yolo": load_yolo,
+    "keras": load_keras,
+}
+
+
+def _resolve_path(spec, options):
+    if spec.loader == "yolo":
+        return backend_model_path(str(spec.path), options.get("backend", "torch"), options.get("int8", False))
+    return str(spec.path)
+
+
+def _estimate_bytes(spec, options):
+    if spec.memory_bytes:
+        return spec.memory_bytes
+    try:
+        size = sum(os.path.getsize(f) for f in _weights_files(_resolve_path(spec, options)))
+    except OSError:
+        return 0
+    return int(size * MEMORY_FACTOR)
+
+
+# ==================================================
+# REGISTRY
+# ==================================================
+class _Entry:
+    def __init__(self, model, size):
+        self.model = model
+        self.size = size
+        self.leases = 0
+
+
+class ModelRegistry:
+    """
+    Loads registered models on demand and keeps the most recently used
+    ones under `memory_budget` bytes.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+
+        self._specs = {}
+        self._active = {}
+        self._loaded = OrderedDict()
+        self._loading = {}
+        self._lock = threading.RLock()
+
+    # ------------------------------
+    # Specs
+    # ------------------------------
+    def register(self, name, version, path, loader="yolo", memory_bytes=None, activate=False):
+        """
+        Add (or replace) a model version. The first version of a name
+        becomes its active version.
+        """
+        if loader not in LOADERS:
+            raise ValueError(f"Unknown loader: {loader}")
+        with self._lock:
+            self._specs[(name, version)] = ModelSpec(name, version, Path(path), loader, memory_bytes)
+            if activate or name not in self._active:
+                self._active[name] = version
+
+    def path(self, name, version=None):
+        """
+        Weights path of a model version (None = active).
+        """
+        version = self.resolve(name, version)
+        with self._lock:
+            return str(self._specs[(name, version)].path)
+
+    def versions(self, name):
+        with self._lock:
+            return sorted(version for n, version in self._specs if n == name)
+
+    def active_version(self, name):
+        with self._lock:
+            if name not in self._active:
+                raise KeyError(f"No model registered as {name!r}")
+            return self._active[name]
+
+    def resolve(self, name, version=None):
+        """
+        The concrete version `version` refers to (None = active).
+        """
+        version = version or self.active_version(name)
+        with self._lock:
+            if (name, version) not in self._specs:
+                raise KeyError(f"No version {version!r} of model {name!r}")
+        return version
+
+    def activate(self, name, version):
+        """
+        Make `version` the default for `name` without loading it.
+        """
+        version = self.resolve(name, version)
+        with self._lock:
+            self._active[name] = version
+
+    def swap(self, name, version, path=None, loader=None, **options):
+        """
+        Hot-swap: load `version` (from `path` if given) and only then
+        register and activate it. A failed load leaves the registry
+        unchanged. Callers still holding the old model keep using it
+        until they release it.
+        """
+        if path is None:
+            self.get(name, version, **options)
+            self.activate(name, version)
+            return
+
+        with self._lock:
+            previous = self._specs.get((name, version))
+        loader = loader or (previous.loader if previous else "yolo")
+        if loader not in LOADERS:
+            raise ValueError(f"Unknown loader: {loader}")
+
+        # Load under the new spec before publishing it: if the weights
+        # fail to load, the registered version stays as it was
+        spec = ModelSpec(name, version, Path(path), loader, None)
+        self._acquire(name, version, options, lease=False, new_spec=spec)
+        with self._lock:
+            self._specs[(name, version)] = spec
+            self._active[name] = version
+
+    # ------------------------------
+    # Access
+    # ------------------------------
+    def get(self, name, version=None, **options):
+        """
+        The shared instance of a model, loading it if needed. `options`
+        are passed to the loader (e.g. backend="onnx") and identify a
+        separate instance.
+
+        The registry may drop the instance later; use lease() to keep
+        it counted as in use.
+        """
+        return self._acquire(name, version, options, lease=False)[1]
+
+    @contextmanager
+    def lease(self, name, version=None, **options):
+        """
+        Like get(), but the model is not evicted while the block runs.
+        """
+        key, model = self._acquire(name, version, options, lease=True)
+        try:
+            yield model
+        finally:
+            self._release(key)
+
+    def _acquire(self, name, version, options, lease, new_spec=None):
+        """
+        (key, model). Instances are keyed by the weights path as well,
+        so re-registering a version with new weights loads them fresh.
+        `new_spec` loads a spec that is not registered (yet).
+        """
+        if new_spec is None:
+            version = self.resolve(name, version)
+
+        while True:
+            with self._lock:
+                spec = new_spec or self._specs[(name, version)]
+                key = (name, version, str(spec.path), _options_key(options))
+                entry = self._loaded.get(key)
+                if entry is not None:
+                    self._loaded.move_to_end(key)
+                    if lease:
+                        entry.leases += 1
+                    return key, entry.model
+
+                future = self._loading.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._loading[key] = future
+
+            if not owner:
+                # Another thread is loading it; once done, look it up
+                # again (and take a lease) under the lock
+                future.result()
+                continue
+
+            try:
+                size = _estimate_bytes(spec, options)
+                with self._lock:
+                    self._make_room(size)
+                model = LOADERS[spec.loader](spec.path, **options)
+            except BaseException as e:
+                with self._lock:
+                    del self._loading[key]
+                future.set_exception(e)
+                raise
+
+            with self._lock:
+                entry = _Entry(model, size)
+                self._loaded[key] = entry
+                self._make_room(0)
+                if lease:
+                    entry.leases += 1
+                del self._loading[key]
+            future.set_result(None)
+            return key, model
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None:
+                entry.leases -= 1
+            self._make_room(0)
+
+    # ------------------------------
+    # Eviction
+    # ------------------------------
+    def memory_used(self):
+        with self._lock:
+            return sum(entry.size for entry in self._loaded.values())
+
+    def _make_room(self, size):
+        """
+        Drop least recently used, unleased models until `size` more
+        bytes fit in the budget (or nothing more can be dropped). The
+        most recently used model is always kept.
+        """
+        used = self.memory_used()
+        for key in list(self._loaded)[:-1]:
+            if used + size <= self.memory_budget:
+                return
+            entry = self._loaded[key]
+            if entry.leases == 0:
+                del self._loaded[key]
+                used -= entry.size
+
+    def evict(self, name, version=None):
+        """
+        Drop every loaded instance of a model version that is not
+        leased. Returns how many were dropped.
+        """
+        version = self.resolve(name, version)
+        with self._lock:
+            keys = [
+                key for key, entry in self._loaded.items()
+                if key[:2] == (name, version) and entry.leases == 0
+            ]
+            for key in keys:
+                del self._loaded[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "memory_used": self.memory_used(),
+                "active": dict(self._active),
+                "versions": {
+                    name: self.versions(name)
+                    for name in sorted({name for name, _ in self._specs})
+                },
+                "loaded": [
+                    {
+                        "name": name,
+                        "version": version,
+                        "options": dict(options),
+                        "bytes": entry.size,
+                        "leases": entry.leases,
+                    }
+                    for (name, version, _, options), entry in self._loaded.items()
+                ],
+            }
+
+
+def _options_key(options):
+    return tuple(sorted(options.items()))
+
+
+# ==================================================
+# PROJECT MODELS
+# ==================================================
+def default_registry(memory_budget=MEMORY_BUDGET):
+    """
+    Registry of the models shipped with the project:
+
+    - "crack": models/crack.pt as "default", plus every trained run
+      with weights in runs/detect/<run>/weights/best.pt as "<run>";
+      STRUCTSCAN_CRACK_VERSION picks the active one
+    - "segmentation": models/unet_crack.h5 as "unet"
+    - "severity": models/severity_effnet.h5 as "effnet"
+    """
+    registry = ModelRegistry(memory_budget)
+
+    registry.register("crack", "default", MODELS_DIR / "crack.pt")
+    register_trained_runs(registry)
+
+    active = os.environ.get("STRUCTSCAN_CRACK_VERSION")
+    if active:
+        registry.activate("crack", active)
+
+    registry.register("segmentation", "unet", MODELS_DIR / "unet_crack.h5", loader="keras")
+    registry.register("severity", "effnet", MODELS_DIR / "severity_effnet.h5", loader="keras")
+    return registry
+
+
+def register_trained_runs(registry, runs_dir=RUNS_DIR):
+    """
+    Register every run in `runs_dir` with weights in
+    <run>/weights/best.pt as crack version "<run>", skipping versions
+    already registered. Call again to pick up runs trained since.
+    Returns the newly registered versions.
+    """
+    runs_dir = Path(runs_dir)
+    if not runs_dir.is_dir():
+        return []
+
+    known = set(registry.versions("crack"))
+    added = []
+    for run in sorted(runs_dir.iterdir()):
+        weights = run / "weights" / "best.pt"
+        if run.name not in known and weights.exists():
+            registry.register("crack", run.name, weights)
+            added.append(run.name)
+    return added
+
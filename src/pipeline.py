@@ -1,31 +1,206 @@
 import os
-from src.inference.detect import load_model, detect_and_save
+import shutil
+import time
+from collections import deque
+from functools import partial
+
+import cv2
+import numpy as np
+
+from src import telemetry
+from src.cache import ResultCache, bytes_digest, file_digest
+from src.dedup import DuplicateIndex, image_hash
+from src.inference import heatmap
+from src.inference.detect import (
+    ARTIFACTS,
+    detect_image,
+    detect_batch,
+    decode_image,
+    encode_image,
+    batch_output_path,
+    heatmap_path_for,
+    preview_pyramid,
+    _batched
+)
+from src.inference.export import backend_model_path
+from src.inference.runtime import configure_threads, warmup_model
+from src.inference.worker_pool import WorkerPool
+from src.model_registry import default_registry
 
 # ==================================================
 # PROJECT PATHS
 # ==================================================
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "crack.pt")
+CACHE_DIR = os.path.join(PROJECT_ROOT, "results", ".cache")
+
+# Inference runtime: "torch", "onnx" or "openvino" (see inference/export.py)
+BACKEND = os.environ.get("STRUCTSCAN_BACKEND", "torch")
+INT8 = os.environ.get("STRUCTSCAN_INT8", "0").lower() in ("1", "true", "yes")
+
+_result_caches = {}
+_model_registry = None
+
+# Seconds spent in each startup step of the last load_models() call
+STARTUP_TIMINGS = {}
+
+# ==================================================
+# MODEL REGISTRY
+# ==================================================
+def get_model_registry():
+    """
+    Process-wide ModelRegistry of the project's models (see
+    model_registry.default_registry).
+    """
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = default_registry()
+    return _model_registry
+
+def crack_model(version=None):
+    """
+    The shared instance of a crack model version (default: the active
+    one) for the configured backend, loaded on first use. Cheap enough
+    to call per request, so a hot-swap is picked up straight away.
+    """
+    return get_model_registry().get("crack", version, backend=BACKEND, int8=INT8)
+
+# ==================================================
+# RESULT CACHE
+# ==================================================
+def get_result_cache(version=None):
+    """
+    Shared on-disk result cache for the weights of a crack model
+    version (default: the active one). Entries of different versions
+    never mix, since the weights hash is part of every key.
+    """
+    weights_path = backend_model_path(get_model_registry().path("crack", version), BACKEND, INT8)
+    cache = _result_caches.get(weights_path)
+    if cache is None:
+        cache = _result_caches.setdefault(weights_path, ResultCache(CACHE_DIR, weights_path))
+    return cache
 
 # ==================================================
 # LOAD MODEL (USED BY app.py)
 # ==================================================
-def load_models():
+def load_models(
+    warmup=False,
+    imgsz=640,
+    num_threads=None,
+    num_interop_threads=None,
+    backend=None,
+    int8=None,
+    version=None
+):
     """
     Loads the trained crack detection model.
+
+    `version` is a crack model version of the registry (default: the
+    active one, STRUCTSCAN_CRACK_VERSION or models/crack.pt); callers
+    asking for the same version share one instance.
+    `backend` / `int8` default to STRUCTSCAN_BACKEND / STRUCTSCAN_INT8.
+
+    With `warmup=True`, torch threads are sized to the host (see
+    runtime.configure_threads) and a dummy inference at `imgsz` is run
+    so the first real request does not pay for initialisation.
+    Step timings are recorded in STARTUP_TIMINGS.
+    """
+    backend = backend or BACKEND
+    int8 = INT8 if int8 is None else int8
+
+    registry = get_model_registry()
+    model_path = backend_model_path(registry.path("crack", version), backend, int8)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found at: {model_path}")
+
+    STARTUP_TIMINGS.clear()
+    start = time.perf_counter()
+
+    if warmup or num_threads or num_interop_threads:
+        STARTUP_TIMINGS["threads"] = configure_threads(num_threads, num_interop_threads)
+
+    model = registry.get("crack", version, backend=backend, int8=int8)
+    STARTUP_TIMINGS["load_s"] = time.perf_counter() - start
+
+    if warmup:
+        STARTUP_TIMINGS["warmup_s"] = warmup_model(model, imgsz=imgsz)
+
+    STARTUP_TIMINGS["time_to_ready_s"] = time.perf_counter() - start
+    return model
+
+
+def load_worker_pool(
+    workers=None,
+    threads_per_worker=None,
+    backend=None,
+    int8=None,
+    warmup=True,
+    imgsz=640,
+    version=None
+):
+    """
+    Starts a WorkerPool of `workers` model processes (default: one per
+    available CPU, one torch thread each) for a crack model `version`.
+    Pass it as the `model` of iter_pipeline_batch / run_pipeline_batch;
+    close() it when done.
     """
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model file not found at: {MODEL_PATH}")
+    backend = backend or BACKEND
+    int8 = INT8 if int8 is None else int8
 
-    return load_model(MODEL_PATH)
+    weights = get_model_registry().path("crack", version)
+    model_path = backend_model_path(weights, backend, int8)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found at: {model_path}")
+
+    start = time.perf_counter()
+    pool = WorkerPool(
+        weights,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+        backend=backend,
+        int8=int8,
+        warmup=warmup,
+        imgsz=imgsz
+    )
+    STARTUP_TIMINGS.clear()
+    STARTUP_TIMINGS["workers"] = pool.workers
+    STARTUP_TIMINGS["time_to_ready_s"] = time.perf_counter() - start
+    return pool
 
 # ==================================================
 # RUN PIPELINE (CORE INFERENCE WRAPPER)
 # ==================================================
-def run_pipeline(model, image_path, output_path):
+def run_pipeline(
+    model,
+    image_path,
+    output_path,
+    conf_threshold=0.25,
+    tile_size=None,
+    tile_overlap=0.2,
+    cache=None,
+    artifacts=ARTIFACTS,
+    quality=None,
+    writer=None,
+    prefilter=None
+):
     """
     Runs crack detection pipeline.
 
+    Set `tile_size` (e.g. 640) for high-resolution survey imagery to
+    run tiled inference at native resolution.
+
+    Pass a ResultCache (e.g. get_result_cache()) as `cache` to reuse
+    earlier results for identical image content, weights and settings
+    (including the output format and quality); a hit's artifacts are
+    copied to `output_path`. The cache is only used when all artifacts
+    are requested.
+
+    `artifacts`, `quality` and `writer` are passed to detect_image:
+    build only some artifacts (() for metrics only), set the encoder
+    quality for the format of `output_path`, and write off-thread.
+    Set `prefilter` (e.g. segmentation.load_threshold()) to skip the
+    model on images the classical-CV pre-filter rates as clean.
+
     Returns a dictionary compatible with app.py:
     - annotated_image (NumPy array)
     - annotated_image_path (str)
@@ -33,28 +208,455 @@ def run_pipeline(model, image_path, output_path):
     - crack_percentage (float)
     - severity_score (float)
     - risk_level (str)
+    - detections (list of [x1, y1, x2, y2, conf])
     """
 
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Input image not found: {image_path}")
 
-    (
-        annotated_img,
-        crack_pct,
-        severity,
-        risk,
-        heatmap_path
-    ) = detect_and_save(
-        model=model,
-        image_path=image_path,
-        output_path=output_path
+    if tuple(artifacts) != ARTIFACTS:
+        cache = None
+
+    key = None
+    if cache is not None:
+        key = _cache_key(
+            cache, file_digest(image_path), conf_threshold, tile_size, tile_overlap, prefilter, output_path, quality
+        )
+        cached = _from_cache(cache, key)
+        if cached is not None:
+            return _place_cached(cached, output_path)
+
+    with telemetry.span("decode"):
+        image = cv2.imread(image_path)
+    if image is None:
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    result = _to_result(
+        detect_image(
+            model,
+            image,
+            output_path=output_path,
+            conf_threshold=conf_threshold,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            artifacts=artifacts,
+            quality=quality,
+            writer=writer,
+            prefilter=prefilter
+        )
     )
 
-    return {
-        "annotated_image": annotated_img,
+    if cache is not None:
+        _to_cache(cache, key, result)
+
+    telemetry.flush()
+    return result
+
+
+# ==================================================
+# RUN PIPELINE ON BYTES / ARRAYS (NO DISK ROUND-TRIP)
+# ==================================================
+def run_pipeline_image(
+    model,
+    image,
+    output_path=None,
+    conf_threshold=0.25,
+    tile_size=None,
+    tile_overlap=0.2,
+    encode=None,
+    cache=None,
+    previews=False,
+    quality=None,
+    prefilter=None
+):
+    """
+    Runs crack detection on raw image bytes or a decoded BGR array.
+
+    Nothing is written unless `output_path` is given, in which case
+    the paths are filled in as with run_pipeline (and `cache` may be
+    used). Set `encode` to an extension such as ".jpg" (or ".webp",
+    ".png", with `quality` as in encode_params) to also get the
+    annotated image and heatmap as encoded buffers, and
+    `previews=True` for a pyramid of encoded previews of both (see
+    preview_pyramid / pick_preview in detect.py).
+
+    Returns the run_pipeline dictionary plus:
+    - heatmap_image (NumPy array)
+    - heatmap_density (NumPy array, reduced resolution)
+    - annotated_image_bytes / heatmap_bytes (bytes, only with encode)
+    - previews: {"annotated": {level: bytes}, "heatmap": {level: bytes}}
+      (only with previews)
+    """
+    key = None
+    if cache is not None and output_path:
+        key = _cache_key(
+            cache, _image_digest(image), conf_threshold, tile_size, tile_overlap, prefilter, output_path, quality
+        )
+        cached = _from_cache(cache, key, with_heatmap=True)
+        if cached is not None:
+            _place_cached(cached, output_path)
+            cached["heatmap_density"] = _cached_density(cached)
+            return _encode_result(cached, encode, previews, quality)
+
+    if not isinstance(image, np.ndarray):
+        with telemetry.span("decode"):
+            image = decode_image(image)
+
+    result = detect_image(
+        model,
+        image,
+        output_path=output_path,
+        conf_threshold=conf_threshold,
+        tile_size=tile_size,
+        tile_overlap=tile_overlap,
+        quality=quality,
+        prefilter=prefilter
+    )
+
+    if key is not None:
+        _to_cache(cache, key, result)
+
+    result = _encode_result(result, encode, previews, quality)
+    telemetry.flush()
+    return result
+
+
+def _image_digest(image):
+    if isinstance(image, np.ndarray):
+        return bytes_digest(str(image.shape).encode("ascii") + image.tobytes())
+    return bytes_digest(bytes(image))
+
+
+def _encode_result(result, encode, previews=False, quality=None):
+    if previews and not encode:
+        encode = ".jpg"
+    if encode:
+        with telemetry.span("encode"):
+            result["annotated_image_bytes"] = encode_image(result["annotated_image"], encode, quality)
+            result["heatmap_bytes"] = encode_image(result["heatmap_image"], encode, quality)
+    if previews:
+        with telemetry.span("previews"):
+            result["previews"] = {
+                "annotated": preview_pyramid(
+                    result["annotated_image"], encode, full=result["annotated_image_bytes"], quality=quality
+                ),
+                "heatmap": preview_pyramid(
+                    result["heatmap_image"], encode, full=result["heatmap_bytes"], quality=quality
+                ),
+            }
+    return result
+
+
+_HEATMAP_ARRAYS = ("heatmap_image", "heatmap_density")
+
+
+def _to_result(outputs):
+    """
+    Drop the in-memory heatmap so path-based results only keep the
+    arrays app.py has always received.
+    """
+    return {k: v for k, v in outputs.items() if k not in _HEATMAP_ARRAYS}
+
+
+_CACHE_EXCLUDED = ("annotated_image",) + _HEATMAP_ARRAYS
+
+
+def _cached_density(entry):
+    """
+    Rebuild the heatmap density of a cached result from its detections.
+    """
+    height, width = entry["annotated_image"].shape[:2]
+    rows = np.asarray(entry["detections"], dtype=np.float32).reshape(-1, 5)
+    return heatmap.box_density(rows[:, :4], rows[:, 4], width, height)
+
+
+def _cache_key(cache, image_digest, conf_threshold, tile_size, tile_overlap, prefilter=None, output_path=None, quality=None):
+    options = {
+        "tile_size": tile_size,
+        "tile_overlap": tile_overlap if tile_size else None,
+        # The artifacts are reused, so they must be in the same format
+        "format": os.path.splitext(output_path)[1].lower() if output_path else None,
+        "quality": quality,
+    }
+    # Only part of the key when used, so existing entries stay valid
+    if prefilter is not None:
+        options["prefilter"] = prefilter
+    return cache.key(image_digest, conf_threshold, **options)
+
+
+def _from_cache(cache, key, with_heatmap=False):
+    """
+    The cached result with its annotated image (and heatmap image, with
+    `with_heatmap`) read back, or None if the entry or any of those
+    files is missing or unreadable.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        telemetry.count("cache_misses")
+        return None
+
+    annotated_img = cv2.imread(entry["annotated_image_path"])
+    heatmap_img = cv2.imread(entry["heatmap_path"]) if with_heatmap else None
+    if annotated_img is None or (with_heatmap and heatmap_img is None):
+        telemetry.count("cache_misses")
+        return None
+
+    telemetry.count("cache_hits")
+
+    entry.pop("weights_hash", None)
+    entry["annotated_image"] = annotated_img
+    if with_heatmap:
+        entry["heatmap_image"] = heatmap_img
+    return entry
+
+
+def _place_cached(entry, output_path):
+    """
+    Copy a cache hit's artifacts to `output_path` (and its heatmap
+    path) when they were first written elsewhere, so the caller finds
+    them where it asked for them. Copies rather than hard links: a
+    later write to either path must not change the other.
+    """
+    targets = {
         "annotated_image_path": output_path,
-        "heatmap_path": heatmap_path,
-        "crack_percentage": float(crack_pct),
-        "severity_score": float(severity),
-        "risk_level": str(risk)
-    }
\ No newline at end of file
+        "heatmap_path": heatmap_path_for(output_path),
+    }
+    for field, target in targets.items():
+        source = entry.get(field)
+        if not source or os.path.abspath(source) == os.path.abspath(target):
+            continue
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        shutil.copyfile(source, target)
+        entry[field] = target
+    return entry
+
+
+def _to_cache(cache, key, result):
+    cache.put(
+        key,
+        {k: v for k, v in result.items() if k not in _CACHE_EXCLUDED}
+    )
+
+# ==================================================
+# RUN PIPELINE ON MANY IMAGES (BATCHED INFERENCE)
+# ==================================================
+def iter_pipeline_batch(
+    model,
+    images,
+    output_dir,
+    batch_size=8,
+    conf_threshold=0.25,
+    tile_size=None,
+    tile_overlap=0.2,
+    cache=None,
+    artifacts=ARTIFACTS,
+    image_format=".jpg",
+    quality=None,
+    writer=None,
+    prefilter=None,
+    dedup=None,
+    output_paths=None
+):
+    """
+    Streams run_pipeline-shaped result dicts for a list or iterator
+    of image paths, bytes or arrays, one YOLO call per `batch_size`
+    images.
+
+    Prefer this over run_pipeline_batch for large surveys so
+    annotated images are not all kept in memory at once. With
+    `output_dir=None` nothing is written and paths are None.
+
+    With a `cache` (and an output_dir), path inputs that hit are
+    served from it and only the misses of each batch go through the
+    model.
+
+    Pass `artifacts=()` for metrics-only runs: no annotation, heatmap,
+    encoding or writes (and no cache). `image_format`, `quality` and
+    `writer` control how artifacts are saved, and `prefilter` skips
+    the model on clean images (see detect_batch).
+
+    With `dedup` set to a Hamming distance (e.g.
+    dedup.DEFAULT_MAX_DISTANCE), images whose perceptual hash is that
+    close to an earlier image skip the model and reuse its result
+    (metrics, detections and artifact paths, without the arrays),
+    marked with "duplicate_of": the representative's input position.
+    dedup.summarize(results) reports how much work was skipped.
+
+    `model` may also be a WorkerPool (see load_worker_pool): images
+    are then decoded here and run across its processes, still yielded
+    in input order but without the annotated_image arrays.
+
+    `output_paths` (an iterable, possibly lazy, with one path per
+    image) names the artifacts explicitly instead of deriving them
+    from `output_dir`, as in detect_batch; not combined with `dedup`.
+    """
+    if dedup is not None and output_paths is not None:
+        raise ValueError("output_paths cannot be combined with dedup")
+
+    if dedup is not None:
+        yield from _iter_deduplicated(
+            lambda sources: iter_pipeline_batch(
+                model,
+                sources,
+                output_dir,
+                batch_size=batch_size,
+                conf_threshold=conf_threshold,
+                tile_size=tile_size,
+                tile_overlap=tile_overlap,
+                cache=cache,
+                artifacts=artifacts,
+                image_format=image_format,
+                quality=quality,
+                writer=writer,
+                prefilter=prefilter
+            ),
+            images,
+            dedup
+        )
+        return
+
+    save_options = dict(
+        artifacts=artifacts,
+        image_format=image_format,
+        quality=quality,
+        writer=writer,
+        prefilter=prefilter
+    )
+
+    detect = model.detect_batch if isinstance(model, WorkerPool) else partial(detect_batch, model)
+
+    if cache is None or output_dir is None or tuple(artifacts) != ARTIFACTS:
+        for outputs in detect(
+            images=images,
+            output_dir=output_dir,
+            conf_threshold=conf_threshold,
+            batch_size=batch_size,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            output_paths=output_paths,
+            **save_options
+        ):
+            yield _to_result(outputs)
+            telemetry.flush()
+        return
+
+    paths = iter(output_paths) if output_paths is not None else None
+    index = 0
+    for chunk in _batched(images, batch_size):
+        results = [None] * len(chunk)
+        misses = []
+
+        for i, source in enumerate(chunk):
+            if paths is not None:
+                output_path = next(paths)
+            else:
+                output_path = batch_output_path(output_dir, source, index + i, image_format)
+            key = None
+            if isinstance(source, (str, os.PathLike)):
+                key = _cache_key(
+                    cache, file_digest(source), conf_threshold, tile_size, tile_overlap, prefilter, output_path, quality
+                )
+                results[i] = _from_cache(cache, key)
+                if results[i] is not None:
+                    _place_cached(results[i], output_path)
+            if results[i] is None:
+                misses.append((i, source, output_path, key))
+        index += len(chunk)
+
+        if misses:
+            computed = detect(
+                images=[source for _, source, _, _ in misses],
+                output_dir=output_dir,
+                conf_threshold=conf_threshold,
+                batch_size=batch_size,
+                tile_size=tile_size,
+                tile_overlap=tile_overlap,
+                output_paths=[path for _, _, path, _ in misses],
+                **save_options
+            )
+            for (i, _, _, key), outputs in zip(misses, computed):
+                results[i] = _to_result(outputs)
+                if key is not None:
+                    _to_cache(cache, key, results[i])
+
+        telemetry.flush()
+        yield from results
+
+
+def _iter_deduplicated(run, images, max_distance):
+    """
+    Feed only representative images to `run` and interleave linked
+    results for their near-duplicates, keeping input order.
+    """
+    index = DuplicateIndex(max_distance)
+    # (position, representative position or None) in input order
+    links = deque()
+    linked = {}
+
+    def representatives():
+        for position, source in enumerate(images):
+            with telemetry.span("dedup"):
+                representative = index.add(image_hash(source), position)
+            links.append((position, representative))
+            if representative is None:
+                yield source
+            else:
+                telemetry.count("dedup_skipped")
+
+    def duplicates():
+        # A duplicate always follows its representative, so every
+        # duplicate at the front of the queue can be resolved
+        while links and links[0][1] is not None:
+            _, representative = links.popleft()
+            yield dict(linked[representative], duplicate_of=representative)
+
+    for result in run(representatives()):
+        yield from duplicates()
+        position, _ = links.popleft()
+        linked[position] = {k: v for k, v in result.items() if k not in _CACHE_EXCLUDED}
+        yield result
+
+    yield from duplicates()
+
+
+def run_pipeline_batch(
+    model,
+    images,
+    output_dir,
+    batch_size=8,
+    conf_threshold=0.25,
+    tile_size=None,
+    tile_overlap=0.2,
+    cache=None,
+    artifacts=ARTIFACTS,
+    image_format=".jpg",
+    quality=None,
+    writer=None,
+    prefilter=None,
+    dedup=None
+):
+    """
+    Runs the crack detection pipeline on many images.
+
+    Returns a list with one dictionary per input image, in input
+    order, each shaped like the run_pipeline result (near-duplicates
+    with `dedup` as in iter_pipeline_batch).
+    """
+    return list(
+        iter_pipeline_batch(
+            model,
+            images,
+            output_dir,
+            batch_size=batch_size,
+            conf_threshold=conf_threshold,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            cache=cache,
+            artifacts=artifacts,
+            image_format=image_format,
+            quality=quality,
+            writer=writer,
+            prefilter=prefilter,
+            dedup=dedup
+        )
+    )
\ No newline at end of file
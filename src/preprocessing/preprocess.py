@@ -2,32 +2,283 @@
 """
 Simple preprocessing utilities:
 - load image
-- resize
+- resize (stretch, or aspect-preserving letterbox)
 - save resized copies into processed folder
+
+batch_resize walks the source tree as a stream, resizes images across
+a process pool and keeps a manifest of source mtime/size (and
+optionally content hash) in the destination folder, so re-runs skip
+images that have not changed. Large JPEGs are decoded straight to a
+reduced resolution (IMREAD_REDUCED_*) when that is still at least the
+target size.
+
+    python -m src.preprocessing.preprocess data/raw/custom_images data/processed/train --letterbox
 """
 
-import cv2
+import argparse
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
-def resize_image(src_path, dst_path, size=(640,640)):
-    img = cv2.imread(str(src_path))
+import cv2
+import numpy as np
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+MANIFEST_NAME = ".preprocess_manifest.json"
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+# ==================================================
+# DECODE
+# ==================================================
+def jpeg_size(path):
+    """
+    (width, height) from a JPEG's SOF header without decoding it,
+    or None if the file is not a readable JPEG.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                while marker[1] == 0xFF:
+                    marker = marker[:1] + f.read(1)
+                code = marker[1]
+                if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                    continue
+                (length,) = struct.unpack(">H", f.read(2))
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack(">xHH", f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def read_image(src_path, size=None, letterbox=False):
+    """
+    Decode an image, using libjpeg's reduced-resolution decode when
+    the reduced image is still no smaller than `size` requires.
+    """
+    flag = cv2.IMREAD_COLOR
+
+    if size is not None and Path(src_path).suffix.lower() in (".jpg", ".jpeg"):
+        dims = jpeg_size(src_path)
+        if dims is not None:
+            width, height = dims
+            tw, th = size
+            for factor, reduced_flag in _REDUCED_FLAGS:
+                w, h = width // factor, height // factor
+                fits = (
+                    max(w / tw, h / th) >= 1 if letterbox
+                    else w >= tw and h >= th
+                )
+                if fits:
+                    flag = reduced_flag
+                    break
+
+    img = cv2.imread(str(src_path), flag)
     if img is None:
-        raise ValueError(f"Failed to read image: {src_path}") 
-    img_resized = cv2.resize(img, size)
+        raise ValueError(f"Failed to read image: {src_path}")
+    return img
+
+
+# ==================================================
+# RESIZE
+# ==================================================
+def letterbox_image(img, size=(640, 640), color=(114, 114, 114)):
+    """
+    Resize keeping aspect ratio and pad to `size` (YOLO letterbox).
+    """
+    tw, th = size
+    h, w = img.shape[:2]
+    scale = min(tw / w, th / h)
+    nw, nh = max(1, round(w * scale)), max(1, round(h * scale))
+
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(img, (nw, nh), interpolation=interpolation)
+
+    canvas = np.full((th, tw, 3), color, dtype=np.uint8)
+    top, left = (th - nh) // 2, (tw - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    return canvas
+
+
+def resize_image(src_path, dst_path, size=(640,640), letterbox=False):
+    img = read_image(src_path, size=size, letterbox=letterbox)
+    if letterbox:
+        img_resized = letterbox_image(img, size)
+    else:
+        img_resized = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
     cv2.imwrite(str(dst_path), img_resized)
 
-def batch_resize(src_dir, dst_dir, size=(640,640)):
+
+# ==================================================
+# INCREMENTAL MANIFEST
+# ==================================================
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest(dst):
+    try:
+        with open(dst / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(dst, manifest):
+    path = dst / MANIFEST_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def iter_images(src_dir, recursive=True):
+    """
+    Stream image paths with their stat results (os.scandir, no full
+    directory listing held in memory).
+    """
+    stack = [str(src_dir)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTS):
+                    yield Path(entry.path), entry.stat()
+
+
+def _is_unchanged(record, stat, src_path, settings, out_path, use_hash):
+    if record is None or record.get("settings") != settings or not out_path.exists():
+        return False
+    if record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    return use_hash and record.get("sha1") == _file_hash(src_path)
+
+
+# ==================================================
+# BATCH
+# ==================================================
+def _resize_job(src_path, dst_path, size, letterbox, use_hash):
+    resize_image(src_path, dst_path, size=size, letterbox=letterbox)
+    return _file_hash(src_path) if use_hash else None
+
+
+def batch_resize(
+    src_dir,
+    dst_dir,
+    size=(640,640),
+    letterbox=False,
+    workers=None,
+    recursive=True,
+    use_hash=False,
+    max_pending=256,
+    save_every=500
+):
+    """
+    Resize every image under src_dir into dst_dir (mirroring
+    sub-folders), skipping images unchanged since the last run.
+
+    The manifest is saved every `save_every` finished images and when
+    the run stops, even on an error or interrupt, so a rerun only
+    redoes images that were still in flight.
+
+    Returns a dict with processed / skipped / failed counts.
+    """
     src = Path(src_dir)
     dst = Path(dst_dir)
     dst.mkdir(parents=True, exist_ok=True)
-    for p in src.glob("*.*"):
-        try:
-            outp = dst / p.name
-            resize_image(p, outp, size=size)
-        except Exception as e:
-            print(f"skipping {p.name}: {e}")
+
+    settings = {"size": list(size), "letterbox": letterbox}
+    manifest = _load_manifest(dst)
+    stats = {"processed": 0, "skipped": 0, "failed": 0}
+    unsaved = 0
+
+    def collect(done, pending):
+        nonlocal unsaved
+        for future in done:
+            rel, stat = pending.pop(future)
+            try:
+                digest = future.result()
+            except Exception as e:
+                print(f"skipping {rel}: {e}")
+                stats["failed"] += 1
+                continue
+            manifest[rel] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha1": digest,
+                "settings": settings,
+            }
+            stats["processed"] += 1
+
+            unsaved += 1
+            if unsaved >= save_every:
+                _save_manifest(dst, manifest)
+                unsaved = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            for p, stat in iter_images(src, recursive=recursive):
+                rel = p.relative_to(src).as_posix()
+                outp = dst / rel
+
+                if _is_unchanged(manifest.get(rel), stat, p, settings, outp, use_hash):
+                    stats["skipped"] += 1
+                    continue
+
+                outp.parent.mkdir(parents=True, exist_ok=True)
+                future = pool.submit(_resize_job, p, outp, tuple(size), letterbox, use_hash)
+                pending[future] = (rel, stat)
+
+                # Bound the number of in-flight jobs so the walk streams
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done, pending)
+
+            collect(list(pending), pending)
+    finally:
+        _save_manifest(dst, manifest)
+    return stats
 
 if __name__ == "__main__":
-    # example usage (edit paths as needed)
-    batch_resize("data/raw/custom_images", "data/processed/train")
-    print("Done resizing.")
+    parser = argparse.ArgumentParser(description="Resize images into the processed folder")
+    parser.add_argument("src", nargs="?", default="data/raw/custom_images")
+    parser.add_argument("dst", nargs="?", default="data/processed/train")
+    parser.add_argument("--size", type=int, nargs=2, default=(640, 640), metavar=("W", "H"))
+    parser.add_argument("--letterbox", action="store_true", help="keep aspect ratio and pad")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--hash", action="store_true", help="compare content hashes when mtime changed")
+    parser.add_argument("--save-every", type=int, default=500, help="save the manifest every N images")
+    args = parser.parse_args()
+
+    stats = batch_resize(
+        args.src,
+        args.dst,
+        size=tuple(args.size),
+        letterbox=args.letterbox,
+        workers=args.workers,
+        use_hash=args.hash,
+        save_every=args.save_every
+    )
+    print(f"Done resizing: {stats}")
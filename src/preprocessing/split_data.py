@@ -1,26 +1,141 @@
+"""
+Deterministic train/val/test split without moving files.
+
+Each image is assigned to a split by a stable hash of its ID (file
+stem), so the same image always lands in the same split on every
+machine and every run. Nothing is moved or copied: the split is written
+as index files that dataset.yaml can point to
+
+    data/processed/splits/train.txt
+    data/processed/splits/val.txt
+    data/processed/splits/test.txt
+
+and a manifest (splits/manifest.json) that pins every assignment. New
+images are added incrementally; images already in the manifest keep
+their split even if the ratios change later.
+
+    python -m src.preprocessing.split_data --val 0.15 --test 0.15
+"""
+
+import argparse
+import hashlib
+import json
 import os
-import random
-import shutil
 
 BASE = "data/processed"
-SRC = f"{BASE}/train"
-VAL = f"{BASE}/val"
-TEST = f"{BASE}/test"
+SPLITS_DIR = f"{BASE}/splits"
+SOURCES = [f"{BASE}/train/images", f"{BASE}/val/images", f"{BASE}/test/images"]
+
+SPLITS = ("train", "val", "test")
+IMAGE_EXTS = (".jpg", ".png", ".jpeg")
+
+
+def hash_fraction(image_id: str) -> float:
+    """
+    Stable value in [0, 1) derived from the image ID.
+    """
+    digest = hashlib.sha1(image_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def assign_split(image_id: str, val_fraction: float, test_fraction: float) -> str:
+    value = hash_fraction(image_id)
+    if value < val_fraction:
+        return "val"
+    if value < val_fraction + test_fraction:
+        return "test"
+    return "train"
+
+
+def find_images(sources):
+    """
+    {image_id: path} for every image under the source folders.
+
+    An ID found in several folders (e.g. the same photo copied into
+    both train and test) is kept once, so it can no longer leak
+    across splits.
+    """
+    images = {}
+    duplicates = 0
+    for src in sources:
+        if not os.path.isdir(src):
+            continue
+        for name in sorted(os.listdir(src)):
+            if not name.lower().endswith(IMAGE_EXTS):
+                continue
+            image_id = os.path.splitext(name)[0]
+            if image_id in images:
+                duplicates += 1
+                continue
+            images[image_id] = os.path.join(src, name)
+
+    if duplicates:
+        print(f"{duplicates} duplicate image ids ignored (first occurrence kept)")
+    return images
+
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"assignments": {}}
+
+
+def split_dataset(
+    sources=SOURCES,
+    splits_dir=SPLITS_DIR,
+    val_fraction=0.15,
+    test_fraction=0.15
+):
+    """
+    Update the manifest with any new images and rewrite the index
+    files. Returns {split: image count}.
+    """
+    os.makedirs(splits_dir, exist_ok=True)
+    manifest_path = os.path.join(splits_dir, "manifest.json")
+
+    manifest = _load_manifest(manifest_path)
+    assignments = manifest["assignments"]
+
+    images = find_images(sources)
+
+    added = 0
+    for image_id in images:
+        if image_id not in assignments:
+            assignments[image_id] = assign_split(image_id, val_fraction, test_fraction)
+            added += 1
+
+    # Absolute paths: ultralytics rewrites "./" anywhere in an index
+    # line (including inside "../"), so relative lines do not resolve
+    lists = {split: [] for split in SPLITS}
+    for image_id, path in sorted(images.items()):
+        lists[assignments[image_id]].append(os.path.abspath(path).replace(os.sep, "/"))
 
-os.makedirs(VAL, exist_ok=True)
-os.makedirs(TEST, exist_ok=True)
+    for split, lines in lists.items():
+        with open(os.path.join(splits_dir, f"{split}.txt"), "w", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in lines)
 
-images = [f for f in os.listdir(SRC) if f.lower().endswith((".jpg", ".png", ".jpeg"))]
-random.shuffle(images)
+    manifest.update(
+        val_fraction=manifest.get("val_fraction", val_fraction),
+        test_fraction=manifest.get("test_fraction", test_fraction)
+    )
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
 
-total = len(images)
-val_count = int(0.15 * total)
-test_count = int(0.15 * total)
+    counts = {split: len(lines) for split, lines in lists.items()}
+    print(f"Split complete: {counts} ({added} new images)")
+    return counts
 
-for img in images[:val_count]:
-    shutil.move(os.path.join(SRC, img), os.path.join(VAL, img))
 
-for img in images[val_count:val_count + test_count]:
-    shutil.move(os.path.join(SRC, img), os.path.join(TEST, img))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash-based dataset split")
+    parser.add_argument("--sources", nargs="+", default=SOURCES)
+    parser.add_argument("--splits-dir", default=SPLITS_DIR)
+    parser.add_argument("--val", type=float, default=0.15)
+    parser.add_argument("--test", type=float, default=0.15)
+    args = parser.parse_args()
 
-print("Split complete")
+    split_dataset(args.sources, args.splits_dir, args.val, args.test)
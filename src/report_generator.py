@@ -4,7 +4,26 @@ from reportlab.lib.colors import green, orange, red, black, HexColor
 from reportlab.lib.utils import ImageReader
 from math import cos, sin, radians
 from datetime import datetime
+from io import BytesIO
+import hashlib
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.dedup import unique_results
+from src.inference.detect import pick_preview
+from src.preprocessing.preprocess import read_image
+
+
+def _image_reader(path, data):
+    if data is not None:
+        return ImageReader(BytesIO(data))
+    if path and os.path.exists(path):
+        return ImageReader(path)
+    return None
 
 
 def generate_pdf_report(
@@ -13,11 +32,20 @@ def generate_pdf_report(
     crack_percentage: float,
     risk_level: str,
     severity_score: float,
-    annotated_image_path: str,
-    heatmap_path: str,
+    annotated_image_path: str = None,
+    heatmap_path: str = None,
     engineer_name: str,
-    project_id: str
+    project_id: str,
+    annotated_image: bytes = None,
+    heatmap_image: bytes = None
 ):
+    """
+    Build the single-image inspection PDF.
+
+    Images are taken from `annotated_image_path` / `heatmap_path`, or
+    from the encoded buffers `annotated_image` / `heatmap_image` when
+    the pipeline ran in memory.
+    """
     c = canvas.Canvas(output_path, pagesize=A4)
     width, height = A4
 
@@ -114,12 +142,12 @@ def generate_pdf_report(
     # ==================================================
     # PAGE 2 — ANNOTATED IMAGE
     # ==================================================
-    if os.path.exists(annotated_image_path):
+    img = _image_reader(annotated_image_path, annotated_image)
+    if img is not None:
         c.showPage()
         c.setFont("Helvetica-Bold", 16)
         c.drawString(50, height - 50, "Crack Detection – Bounding Boxes")
 
-        img = ImageReader(annotated_image_path)
         c.drawImage(
             img,
             50,
@@ -135,12 +163,12 @@ def generate_pdf_report(
     # ==================================================
     # PAGE 3 — HEATMAP
     # ==================================================
-    if heatmap_path and os.path.exists(heatmap_path):
+    img = _image_reader(heatmap_path, heatmap_image)
+    if img is not None:
         c.showPage()
         c.setFont("Helvetica-Bold", 16)
         c.drawString(50, height - 50, "Crack Density Heatmap")
 
-        img = ImageReader(heatmap_path)
         c.drawImage(
             img,
             50,
@@ -154,4 +182,338 @@ def generate_pdf_report(
         c.drawString(50, 40, "Red areas indicate higher crack concentration")
 
     c.save()
-    return output_path
\ No newline at end of file
+    return output_path
+
+# ==================================================
+# PROJECT REPORT (MANY IMAGES)
+# ==================================================
+RISK_COLORS = {"Low": green, "Medium": orange, "High": red}
+
+
+class _ImageEmbedder:
+    """
+    Downscales images to the size they are drawn at (`dpi`) and
+    JPEG-compresses them into `work_dir` before embedding. Each distinct
+    asset is prepared once, and ReportLab stores a file drawn several
+    times as a single PDF object, passing the JPEG through without
+    decoding it again.
+    """
+
+    def __init__(self, work_dir, dpi=96, jpeg_quality=70):
+        self.work_dir = work_dir
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self._files = {}
+
+    def _key(self, source):
+        if isinstance(source, np.ndarray):
+            return hashlib.sha1(source.tobytes()).hexdigest()
+        if isinstance(source, (bytes, bytearray)):
+            return hashlib.sha1(source).hexdigest()
+        stat = os.stat(source)
+        return f"{os.path.realpath(source)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _load(self, source, size):
+        if isinstance(source, np.ndarray):
+            return source
+        if isinstance(source, (bytes, bytearray)):
+            return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return read_image(source, size=size, letterbox=True)
+
+    def path(self, source, box_width, box_height):
+        """
+        Path of the prepared JPEG for `source` (path, encoded bytes or
+        BGR array) sized for a box_width x box_height point box, or None.
+        """
+        if source is None:
+            return None
+        if isinstance(source, str) and not os.path.exists(source):
+            return None
+
+        tw = max(1, round(box_width / 72 * self.dpi))
+        th = max(1, round(box_height / 72 * self.dpi))
+        key = (self._key(source), tw, th)
+
+        if key not in self._files:
+            path = None
+            img = self._load(source, (tw, th))
+            if img is not None:
+                h, w = img.shape[:2]
+                scale = min(tw / w, th / h)
+                if scale < 1:
+                    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                    img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+                name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+                path = os.path.join(self.work_dir, f"{name}.jpg")
+                if not cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]):
+                    path = None
+            self._files[key] = path
+
+        return self._files[key]
+
+    def prefetch(self, items, workers=None):
+        """
+        Prepare (source, box_width, box_height) items on a thread pool;
+        OpenCV releases the GIL while decoding and resizing.
+        """
+        unique = {}
+        for source, box_width, box_height in items:
+            if isinstance(source, str):
+                unique.setdefault((source, box_width, box_height), (source, box_width, box_height))
+            elif source is not None:
+                unique.setdefault((id(source), box_width, box_height), (source, box_width, box_height))
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            list(pool.map(lambda item: self.path(*item), unique.values()))
+
+    def draw(self, c, source, x, y, box_width, box_height):
+        path = self.path(source, box_width, box_height)
+        if path is None:
+            return False
+        c.drawImage(path, x, y, width=box_width, height=box_height, preserveAspectRatio=True)
+        return True
+
+
+def _result_name(result, index):
+    if result.get("name"):
+        return str(result["name"])
+    if result.get("annotated_image_path"):
+        return os.path.basename(result["annotated_image_path"])
+    return f"Image {index + 1}"
+
+
+_IMAGE_KEYS = {
+    "annotated": ("annotated_image_path", "annotated_image_bytes", "annotated_image"),
+    "heatmap": ("heatmap_path", "heatmap_bytes", "heatmap_image"),
+}
+
+
+def _result_image(result, kind, max_side):
+    """
+    Best available source for a result's "annotated" or "heatmap"
+    image: the smallest preview of at least `max_side` pixels, else the
+    file on disk (decoded at reduced resolution), else encoded bytes,
+    else the in-memory array.
+    """
+    if result.get("previews"):
+        return pick_preview(result["previews"][kind], max_side)
+
+    path_key, bytes_key, array_key = _IMAGE_KEYS[kind]
+    path = result.get(path_key)
+    if path and os.path.exists(path):
+        return path
+    if result.get(bytes_key) is not None:
+        return result[bytes_key]
+    return result.get(array_key)
+
+
+def _footer(c, text):
+    c.setFont("Helvetica", 9)
+    c.setFillColor(black)
+    c.drawString(50, 40, text)
+
+
+def _draw_severity_distribution(c, results, x, y, chart_width, chart_height):
+    """
+    Histogram of severity scores in 10-point bins, coloured by the
+    risk level each bin falls in.
+    """
+    scores = np.array([r["severity_score"] for r in results], dtype=np.float32)
+    counts, _ = np.histogram(scores, bins=10, range=(0, 100))
+    peak = max(int(counts.max()), 1) if len(counts) else 1
+
+    bar_width = chart_width / 10
+    for i, n in enumerate(counts.tolist()):
+        lower = i * 10
+        color = green if lower < 20 else orange if lower < 50 else red
+        bar_height = chart_height * n / peak
+        c.setFillColor(color)
+        c.rect(x + i * bar_width + 2, y, bar_width - 4, bar_height, stroke=0, fill=1)
+
+        c.setFillColor(black)
+        c.setFont("Helvetica", 8)
+        c.drawCentredString(x + (i + 0.5) * bar_width, y - 12, f"{lower}-{lower + 10}")
+        if n:
+            c.drawCentredString(x + (i + 0.5) * bar_width, y + bar_height + 3, str(n))
+
+    c.setStrokeColor(black)
+    c.setLineWidth(1)
+    c.line(x, y, x + chart_width, y)
+
+
+def generate_project_report(
+    *,
+    output_path: str,
+    results,
+    engineer_name: str,
+    project_id: str,
+    include_heatmaps: bool = True,
+    dpi: int = 96,
+    jpeg_quality: int = 70,
+    results_per_page: int = 3
+):
+    """
+    Build one PDF for a whole inspection: a summary page with a
+    severity distribution, a summary table and per-image pages.
+
+    `results` are run_pipeline / run_pipeline_batch dicts. Images are
+    taken from their paths, or from annotated_image_bytes /
+    heatmap_bytes (or the arrays) for in-memory results, downscaled to
+    `dpi` at their printed size and JPEG-compressed before embedding.
+
+    Near-duplicates (results with "duplicate_of", see pipeline `dedup`)
+    are listed in the table but left out of the statistics and get no
+    image page.
+    """
+    results = list(results)
+    with tempfile.TemporaryDirectory() as work_dir:
+        embedder = _ImageEmbedder(work_dir, dpi=dpi, jpeg_quality=jpeg_quality)
+        _draw_project_report(
+            output_path, results, engineer_name, project_id,
+            embedder, include_heatmaps, results_per_page
+        )
+    return output_path
+
+
+def _draw_project_report(
+    output_path,
+    results,
+    engineer_name,
+    project_id,
+    embedder,
+    include_heatmaps,
+    results_per_page
+):
+    c = canvas.Canvas(output_path, pagesize=A4)
+    width, height = A4
+
+    report_date = datetime.now().strftime("%d %B %Y | %I:%M %p")
+
+    # ==================================================
+    # PAGE 1 — PROJECT SUMMARY
+    # ==================================================
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(50, height - 50, "StructScan AI – Project Inspection Report")
+    c.line(50, height - 60, width - 50, height - 60)
+
+    c.setFont("Helvetica", 11)
+    c.drawString(50, height - 95, f"Date: {report_date}")
+    c.drawString(50, height - 120, f"Engineer: {engineer_name}")
+    c.drawString(350, height - 120, f"Project ID: {project_id}")
+
+    unique = unique_results(results)
+
+    risk_counts = {level: 0 for level in RISK_COLORS}
+    for r in unique:
+        risk_counts[r["risk_level"]] = risk_counts.get(r["risk_level"], 0) + 1
+
+    coverage = [r["crack_percentage"] for r in unique]
+    severity = [r["severity_score"] for r in unique]
+
+    c.setFont("Helvetica", 12)
+    c.drawString(50, height - 170, f"Images Inspected: {len(unique)}")
+    if unique:
+        c.drawString(50, height - 195, f"Mean Crack Coverage: {np.mean(coverage):.2f}%")
+        c.drawString(50, height - 220, f"Max Severity Score: {max(severity):.1f} / 100")
+    if len(unique) < len(results):
+        c.drawString(50, height - 245, f"Near-duplicates (not counted): {len(results) - len(unique)}")
+
+    y = height - 170
+    for level, color in RISK_COLORS.items():
+        c.setFillColor(color)
+        c.rect(350, y - 2, 10, 10, stroke=0, fill=1)
+        c.setFillColor(black)
+        c.drawString(368, y, f"{level} Risk: {risk_counts.get(level, 0)}")
+        y -= 25
+
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(50, height - 290, "Severity Distribution")
+    if unique:
+        _draw_severity_distribution(c, unique, 60, height - 520, width - 120, 200)
+
+    _footer(c, "Generated by StructScan AI")
+
+    # ==================================================
+    # SUMMARY TABLE
+    # ==================================================
+    columns = (("#", 50), ("Image", 80), ("Coverage %", 300), ("Severity", 380), ("Risk", 450), ("Cracks", 505))
+    row_height = 18
+
+    for start in range(0, len(results), 38):
+        c.showPage()
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, height - 50, "Inspection Summary")
+
+        y = height - 85
+        c.setFont("Helvetica-Bold", 10)
+        for title, x in columns:
+            c.drawString(x, y, title)
+        c.line(50, y - 5, width - 50, y - 5)
+
+        c.setFont("Helvetica", 9)
+        for i, r in enumerate(results[start:start + 38], start):
+            y -= row_height
+            name = _result_name(r, i)
+            if r.get("duplicate_of") is not None:
+                name = f"duplicate of #{r['duplicate_of'] + 1}"
+            c.setFillColor(black)
+            c.drawString(50, y, str(i + 1))
+            c.drawString(80, y, name if len(name) <= 40 else name[:37] + "...")
+            c.drawString(300, y, f"{r['crack_percentage']:.2f}")
+            c.drawString(380, y, f"{r['severity_score']:.1f}")
+            c.setFillColor(RISK_COLORS.get(r["risk_level"], black))
+            c.drawString(450, y, r["risk_level"])
+            c.setFillColor(black)
+            c.drawString(505, y, str(len(r.get("detections") or [])))
+
+        _footer(c, "StructScan AI – Inspection Summary")
+
+    # ==================================================
+    # PER-IMAGE PAGES
+    # ==================================================
+    slot_height = (height - 130) / results_per_page
+    columns_count = 2 if include_heatmaps else 1
+    gap = 10
+    image_width = (width - 100 - gap * (columns_count - 1)) / columns_count
+    image_height = slot_height - 40
+
+    max_side = round(max(image_width, image_height) / 72 * embedder.dpi)
+    kinds = ("annotated", "heatmap") if include_heatmaps else ("annotated",)
+    pages = [(i, r) for i, r in enumerate(results) if r.get("duplicate_of") is None]
+    embedder.prefetch([
+        (_result_image(r, kind, max_side), image_width, image_height)
+        for _, r in pages
+        for kind in kinds
+    ])
+
+    for page_index, (i, r) in enumerate(pages):
+        slot = page_index % results_per_page
+        if slot == 0:
+            c.showPage()
+            _footer(c, "StructScan AI – Detection Output (left) and Crack Density Heatmap (right)"
+                    if include_heatmaps else "StructScan AI – Detection Output")
+
+        top = height - 50 - slot * slot_height
+
+        c.setFillColor(black)
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(50, top, f"{i + 1}. {_result_name(r, i)}")
+        c.setFont("Helvetica", 10)
+        c.setFillColor(RISK_COLORS.get(r["risk_level"], black))
+        c.drawRightString(
+            width - 50,
+            top,
+            f"Coverage {r['crack_percentage']:.2f}% | "
+            f"Severity {r['severity_score']:.1f} | {r['risk_level']} Risk"
+        )
+
+        image_y = top - 12 - image_height
+        for column, kind in enumerate(kinds):
+            embedder.draw(
+                c,
+                _result_image(r, kind, max_side),
+                50 + column * (image_width + gap), image_y, image_width, image_height
+            )
+
+    c.save()
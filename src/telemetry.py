@@ -0,0 +1,223 @@
+"""
+Per-stage tracing and metrics for the inspection pipeline.
+
+run_pipeline and detect_image wrap each stage in `span(name)` and
+record counters with `count(name, value)`. Telemetry is off by default;
+while off, `span` returns a shared no-op context manager and `count`
+returns immediately, so the instrumentation costs a flag check.
+
+Once enabled, every finished span and counter update:
+- updates an in-process registry, exposed in Prometheus text format
+  via prometheus_text(), write_prometheus(path) or start_http_server()
+- is logged as one JSON line on the "structscan.telemetry" logger
+- is passed to any hooks registered with add_hook(fn)
+
+    from src import telemetry
+    telemetry.enable(prometheus_path="results/metrics.prom")
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("structscan.telemetry")
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_SPAN = nullcontext()
+
+_enabled = False
+_json_logs = True
+_prometheus_path = None
+_hooks = []
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+# ==================================================
+# CONFIGURATION
+# ==================================================
+def enable(json_logs: bool = True, prometheus_path: str = None):
+    """
+    Turn instrumentation on. With `prometheus_path`, the metrics file
+    is rewritten after each pipeline run (see flush()).
+    """
+    global _enabled, _json_logs, _prometheus_path
+    _json_logs = json_logs
+    _prometheus_path = prometheus_path
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def add_hook(fn):
+    """
+    Register fn(event: dict), called for every span and counter event.
+    """
+    _hooks.append(fn)
+
+
+def remove_hook(fn):
+    _hooks.remove(fn)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+if os.environ.get("STRUCTSCAN_TELEMETRY", "0").lower() in ("1", "true", "yes"):
+    enable(prometheus_path=os.environ.get("STRUCTSCAN_METRICS_PATH"))
+
+
+# ==================================================
+# RECORDING
+# ==================================================
+def span(name: str, **attrs):
+    """
+    Context manager timing one pipeline stage.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _span(name, attrs)
+
+
+@contextmanager
+def _span(name, attrs):
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _observe(name, duration)
+        event = {"type": "span", "name": name, "duration_s": round(duration, 6), **attrs}
+        if error:
+            event["error"] = error
+        _emit(event)
+
+
+def count(name: str, value: float = 1):
+    """
+    Increment a counter (e.g. images_processed, detections, cache_hits).
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+    _emit({"type": "counter", "name": name, "value": value})
+
+
+def _observe(name, duration):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0}
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                hist["buckets"][i] += 1
+        hist["count"] += 1
+        hist["sum"] += duration
+
+
+def _emit(event):
+    if _json_logs and logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, default=str))
+    for hook in _hooks:
+        hook(event)
+
+
+# ==================================================
+# EXPORT
+# ==================================================
+def prometheus_text() -> str:
+    lines = []
+    with _lock:
+        for name, value in sorted(_counters.items()):
+            metric = f"structscan_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        if _histograms:
+            metric = "structscan_stage_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for name, hist in sorted(_histograms.items()):
+                for bound, n in zip(BUCKETS, hist["buckets"]):
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {n}')
+                lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {hist["sum"]:.6f}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {hist["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """
+    Atomically write the metrics in Prometheus text format (suitable
+    for the node_exporter textfile collector).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    # Unique temp name, so concurrent writers (threads or processes
+    # flushing to the same file) never truncate each other's
+    # half-written file; ".tmp" keeps the textfile collector off it
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_text())
+        # mkstemp creates 0600; the collector may run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def flush():
+    """
+    Called at the end of each pipeline run.
+    """
+    if _enabled and _prometheus_path:
+        write_prometheus(_prometheus_path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int = 9108, host: str = "0.0.0.0"):
+    """
+    Serve prometheus_text() on http://host:port/ from a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,97 @@
+# src/training/shard_dataset.py
+"""
+ultralytics adapter for packed shards (see shards.py).
+
+ShardTrainer is a DetectionTrainer whose datasets read images and
+labels from a ShardReader when the split path is a shard directory, and
+fall back to the stock YOLODataset otherwise. Label files are never
+parsed or verified at startup; the shard index already holds them.
+"""
+
+import math
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.torch_utils import de_parallel
+
+from src.training.shards import ShardReader, is_shard_dir
+
+
+class ShardYOLODataset(YOLODataset):
+    def __init__(self, *args, img_path, **kwargs):
+        self.reader = ShardReader(img_path)
+        super().__init__(*args, img_path=img_path, **kwargs)
+
+    def get_img_files(self, img_path):
+        files = list(self.reader.files)
+        if self.fraction < 1:
+            files = files[:round(len(files) * self.fraction)]
+        return files
+
+    def get_labels(self):
+        labels = []
+        for i, im_file in enumerate(self.im_files):
+            rows = self.reader.image_labels(i)
+            labels.append({
+                "im_file": im_file,
+                "shape": self.reader.original_shape(i),
+                "cls": rows[:, 0:1].copy(),
+                "bboxes": rows[:, 1:5].copy(),
+                "segments": [],
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            })
+        return labels
+
+    def load_image(self, i, rect_mode=True):
+        # One image copy per sample; the shard pages themselves stay
+        # shared between workers through the OS page cache
+        im = np.array(self.reader.image(i))
+        h0, w0 = self.reader.original_shape(i)
+
+        h, w = im.shape[:2]
+        if rect_mode:
+            r = self.imgsz / max(h, w)
+            if r != 1:
+                size = (min(math.ceil(w * r), self.imgsz), min(math.ceil(h * r), self.imgsz))
+                im = cv2.resize(im, size, interpolation=cv2.INTER_LINEAR)
+        elif not (h == w == self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        # Mosaic samples its extra images from the buffer of recent
+        # indices; the pixels are not cached since the shards are
+        if self.augment:
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+
+        return im, (h0, w0), im.shape[:2]
+
+
+class ShardTrainer(DetectionTrainer):
+    def build_dataset(self, img_path, mode="train", batch=None):
+        if not is_shard_dir(img_path):
+            return super().build_dataset(img_path, mode, batch)
+
+        gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        return ShardYOLODataset(
+            img_path=img_path,
+            imgsz=self.args.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=self.args,
+            rect=self.args.rect or mode == "val",
+            cache=None,
+            single_cls=self.args.single_cls or False,
+            stride=gs,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=colorstr(f"{mode}: "),
+            task=self.args.task,
+            classes=self.args.classes,
+            data=self.data,
+            fraction=self.args.fraction if mode == "train" else 1.0
+        )
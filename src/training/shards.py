@@ -0,0 +1,250 @@
+# src/training/shards.py
+"""
+Pack a dataset split into memory-mapped training shards.
+
+Each image is decoded once, resized so its long side is `imgsz` (the
+same resize ultralytics applies in load_image) and appended as raw
+uint8 BGR pixels to contiguous shard files. The layout of one split:
+
+    shards/train/
+        shard_00000.bin ...   raw pixels, images back to back
+        index.npy             per image: shard, offset, h, w, h0, w0,
+                              label_start, label_count
+        labels.npy            float32 (N, 5) rows: cls, x, y, w, h
+        meta.json             imgsz, source file names, shard names
+
+Readers open the shards with np.memmap, so dataloader workers share the
+OS page cache instead of each decoding and caching its own copy, and
+startup only loads the small index and label arrays.
+
+    python -m src.training.shards --splits train val
+"""
+
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.preprocessing.preprocess import iter_images, read_image
+
+BASE = "data/processed"
+SHARDS_DIR = f"{BASE}/shards"
+
+INDEX_DTYPE = np.dtype([
+    ("shard", np.int32),
+    ("offset", np.int64),
+    ("h", np.int32),
+    ("w", np.int32),
+    ("h0", np.int32),
+    ("w0", np.int32),
+    ("label_start", np.int64),
+    ("label_count", np.int32),
+])
+
+
+def is_shard_dir(path) -> bool:
+    return os.path.isfile(os.path.join(str(path), "meta.json"))
+
+
+# ==================================================
+# PACK
+# ==================================================
+def _read_labels(label_path):
+    try:
+        rows = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    except (OSError, ValueError):
+        return np.zeros((0, 5), dtype=np.float32)
+    return rows[:, :5] if rows.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def _load_sample(image_path, label_path, imgsz):
+    img = read_image(image_path, size=(imgsz, imgsz), letterbox=True)
+    h0, w0 = img.shape[:2]
+
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w = min(math.ceil(w0 * r), imgsz)
+        h = min(math.ceil(h0 * r), imgsz)
+        interpolation = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+        img = cv2.resize(img, (w, h), interpolation=interpolation)
+
+    return np.ascontiguousarray(img), (h0, w0), _read_labels(label_path)
+
+
+def pack_split(
+    images_dir,
+    labels_dir,
+    out_dir,
+    imgsz=640,
+    shard_bytes=1 << 30,
+    workers=None
+):
+    """
+    Pack one split. Returns the number of images packed.
+    """
+    images_dir = Path(images_dir)
+    labels_dir = Path(labels_dir)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # meta.json is written last, so a half-written split is never used
+    meta_path = out_dir / "meta.json"
+    if meta_path.exists():
+        meta_path.unlink()
+    for old in out_dir.glob("shard_*.bin"):
+        old.unlink()
+
+    image_paths = sorted(p for p, _ in iter_images(images_dir))
+    label_paths = [
+        labels_dir / p.relative_to(images_dir).with_suffix(".txt")
+        for p in image_paths
+    ]
+
+    index = np.zeros(len(image_paths), dtype=INDEX_DTYPE)
+    labels = []
+    shards = []
+    shard_file = None
+    label_start = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            samples = pool.map(
+                _load_sample,
+                image_paths,
+                label_paths,
+                [imgsz] * len(image_paths),
+                chunksize=16
+            )
+            for i, (img, (h0, w0), rows) in enumerate(samples):
+                if shard_file is None or shard_file.tell() + img.nbytes > shard_bytes:
+                    if shard_file is not None:
+                        shard_file.close()
+                    shards.append(f"shard_{len(shards):05d}.bin")
+                    shard_file = open(out_dir / shards[-1], "wb")
+
+                index[i] = (
+                    len(shards) - 1, shard_file.tell(),
+                    img.shape[0], img.shape[1], h0, w0,
+                    label_start, len(rows)
+                )
+                shard_file.write(img.tobytes())
+                labels.append(rows)
+                label_start += len(rows)
+    finally:
+        if shard_file is not None:
+            shard_file.close()
+
+    all_labels = np.concatenate(labels) if labels else np.zeros((0, 5), dtype=np.float32)
+    np.save(out_dir / "index.npy", index)
+    np.save(out_dir / "labels.npy", all_labels.astype(np.float32))
+
+    meta = {
+        "imgsz": imgsz,
+        "shards": shards,
+        "files": [str(p) for p in image_paths],
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    return len(image_paths)
+
+
+def pack_dataset(base=BASE, out_dir=SHARDS_DIR, splits=("train", "val"), imgsz=640, workers=None):
+    """
+    Pack each split under base/<split>/{images,labels} and write a
+    dataset yaml for train(..., shards=True).
+    """
+    for split in splits:
+        count = pack_split(
+            Path(base) / split / "images",
+            Path(base) / split / "labels",
+            Path(out_dir) / split,
+            imgsz=imgsz,
+            workers=workers
+        )
+        print(f"Packed {split}: {count} images")
+
+    yaml_path = Path(out_dir) / "dataset.yaml"
+    lines = [f"path: {Path(out_dir).resolve().as_posix()}", ""]
+    lines += [f"{split}: {split}" for split in splits]
+    lines += ["", "names:", "  0: crack", ""]
+    yaml_path.write_text("\n".join(lines))
+    return str(yaml_path)
+
+
+# ==================================================
+# READ
+# ==================================================
+class ShardReader:
+    """
+    Random access to a packed split. Shards are memory-mapped on first
+    use in each process, so the reader can be pickled into dataloader
+    workers cheaply.
+    """
+
+    def __init__(self, shard_dir):
+        self.shard_dir = Path(shard_dir)
+        with open(self.shard_dir / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.index = np.load(self.shard_dir / "index.npy")
+        self.labels = np.load(self.shard_dir / "labels.npy")
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_maps"] = {}
+        return state
+
+    @property
+    def imgsz(self):
+        return self.meta["imgsz"]
+
+    @property
+    def files(self):
+        return self.meta["files"]
+
+    def _shard(self, i):
+        shard = self._maps.get(i)
+        if shard is None:
+            path = self.shard_dir / self.meta["shards"][i]
+            shard = self._maps[i] = np.memmap(path, dtype=np.uint8, mode="r")
+        return shard
+
+    def image(self, i):
+        """
+        Read-only (h, w, 3) view into the shard; copy before modifying.
+        """
+        rec = self.index[i]
+        h, w = int(rec["h"]), int(rec["w"])
+        start = int(rec["offset"])
+        return self._shard(int(rec["shard"]))[start:start + h * w * 3].reshape(h, w, 3)
+
+    def original_shape(self, i):
+        rec = self.index[i]
+        return int(rec["h0"]), int(rec["w0"])
+
+    def image_labels(self, i):
+        rec = self.index[i]
+        start = int(rec["label_start"])
+        return self.labels[start:start + int(rec["label_count"])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack dataset splits into memory-mapped shards")
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--out", default=SHARDS_DIR)
+    parser.add_argument("--splits", nargs="+", default=["train", "val"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    yaml_path = pack_dataset(args.base, args.out, args.splits, args.imgsz, args.workers)
+    print(f"Dataset yaml: {yaml_path}")
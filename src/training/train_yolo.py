@@ -2,15 +2,38 @@
 """
 Minimal YOLOv8 training starter using ultralytics.
 Edit dataset.yaml path and hyperparameters before running.
+
+For faster CPU training, pack the splits into memory-mapped shards
+first and train from the generated yaml:
+
+    python -m src.training.shards --splits train val
+    python -m src.training.train_yolo --shards
 """
 
+import argparse
+
 from ultralytics import YOLO
 
-def train(dataset_yaml="dataset.yaml", epochs=30, imgsz=640, model="yolov8n.pt"):
+SHARDS_YAML = "data/processed/shards/dataset.yaml"
+
+def train(dataset_yaml="dataset.yaml", epochs=30, imgsz=640, model="yolov8n.pt", shards=False):
     print("Starting YOLOv8 training...")
     model = YOLO(model)
-    model.train(data=dataset_yaml, epochs=epochs, imgsz=imgsz)
+    if shards:
+        from src.training.shard_dataset import ShardTrainer
+        model.train(data=dataset_yaml, epochs=epochs, imgsz=imgsz, trainer=ShardTrainer)
+    else:
+        model.train(data=dataset_yaml, epochs=epochs, imgsz=imgsz)
     print("Training finished.")
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the YOLOv8 crack detector")
+    parser.add_argument("--data", default=None)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--shards", action="store_true", help="read packed shards")
+    args = parser.parse_args()
+
+    data = args.data or (SHARDS_YAML if args.shards else "dataset.yaml")
+    train(data, args.epochs, args.imgsz, args.model, shards=args.shards)
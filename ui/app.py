@@ -10,8 +10,16 @@ PROJECT_ROOT = os.getcwd()
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from src.pipeline import load_models, run_pipeline
-from src.report_generator import generate_pdf_report
+from src.pipeline import crack_model, load_models, run_pipeline_image
+from ui.components.rendering import (
+    RenderQueue,
+    SNAPSHOT_SIZE,
+    render_report,
+    render_snapshot,
+    result_fingerprint,
+    result_image
+)
+from ui.components.session import analysis_slot, analysis_slots, compact_result
 
 # ==================================================
 # PAGE CONFIG
@@ -222,31 +230,89 @@ st.markdown('</div>', unsafe_allow_html=True)
 # LOAD MODEL
 # ==================================================
 @st.cache_resource
-def get_model():
-    return load_models()
+def warm_up_model():
+    # Loads and warms the active version in the shared model registry
+    load_models(warmup=True)
+
+warm_up_model()
+
+# Looked up on every run, so a model swapped in the registry is used
+# from the next interaction on
+model = crack_model()
 
-model = get_model()
+@st.cache_resource
+def get_analysis_slots():
+    return analysis_slots()
+
+# ==================================================
+# BACKGROUND RENDERING (shared by all sessions)
+# ==================================================
+@st.cache_resource
+def get_render_queue():
+    return RenderQueue()
+
+render_queue = get_render_queue()
+
+
+@st.fragment(run_every=0.5)
+def await_render(key):
+    """
+    Progress for a running background render; once the job finishes,
+    rerun the whole app so render_download() shows the result and
+    this fragment (and its timer) is no longer rendered.
+    """
+    future = render_queue.get(key)
+    if future is None:
+        return
+    if future.done():
+        st.rerun(scope="app")
+    st.info("⏳ Rendering in the background...")
+
+
+def render_download(key, label, file_name, mime):
+    """
+    The download button for a finished background render job, or a
+    polling progress fragment while it runs.
+    """
+    future = render_queue.get(key)
+    if future is None:
+        return
+    if not future.done():
+        await_render(key)
+        return
+    if future.exception() is not None:
+        st.error(f"Rendering failed: {future.exception()}")
+        return
+
+    st.download_button(label, future.result(), file_name=file_name, mime=mime, key=f"dl-{key}")
 
 # ==================================================
 # RUN ANALYSIS
 # ==================================================
 if uploaded_image:
-    temp_dir = os.path.join(PROJECT_ROOT, "results")
-    os.makedirs(temp_dir, exist_ok=True)
-
-    temp_image_path = os.path.join(temp_dir, "temp_uploaded.jpg")
-    with open(temp_image_path, "wb") as f:
-        f.write(uploaded_image.read())
+    image_bytes = uploaded_image.getvalue()
 
-    st.image(temp_image_path, use_container_width=True)
+    st.image(image_bytes, use_container_width=True)
 
     if st.button("🚀 Run Structural Analysis"):
-        with st.spinner("🔍 Analyzing cracks using AI..."):
-            st.session_state.result = run_pipeline(
-                model=model,
-                image_path=temp_image_path,
-                output_path=os.path.join(temp_dir, "annotated_output.jpg")
-            )
+        waiting = st.empty()
+        try:
+            with analysis_slot(
+                get_analysis_slots(),
+                on_wait=lambda: waiting.info("⏳ Other inspections are running, waiting for a free slot...")
+            ):
+                waiting.empty()
+                with st.spinner("🔍 Analyzing cracks using AI..."):
+                    result = compact_result(run_pipeline_image(
+                        model=model,
+                        image=image_bytes,
+                        encode=".jpg",
+                        previews=True
+                    ))
+            result["fingerprint"] = result_fingerprint(result)
+            st.session_state.result = result
+        except TimeoutError:
+            waiting.warning("⚠️ The server is busy. Please try again in a moment.")
 
 # ==================================================
 # RESULTS + HEATMAP + PDF
@@ -298,8 +364,6 @@ if "result" in st.session_state:
     st.markdown('</div>', unsafe_allow_html=True)
 
     # ---------- Crack Visualization ----------
-    heatmap_path = r.get("heatmap_path", None)
-
     st.markdown('<div class="glass">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">🧠 Crack Visualization</div>', unsafe_allow_html=True)
 
@@ -308,13 +372,18 @@ if "result" in st.session_state:
         ["Bounding Boxes", "Heatmap"],
         horizontal=True
     )
+    zoom = st.toggle("🔍 Full resolution", value=False)
 
+    # Screen-size previews unless the user zooms in to full resolution
+    display_side = None if zoom else 1280
     if view_mode == "Bounding Boxes":
-        st.image(r["annotated_image"], use_container_width=True)
-    elif heatmap_path:
-        st.image(heatmap_path, use_container_width=True)
+        st.image(result_image(r, "annotated", display_side), use_container_width=True)
     else:
-        st.warning("Heatmap not available.")
+        heatmap_image = result_image(r, "heatmap", display_side)
+        if heatmap_image is not None:
+            st.image(heatmap_image, use_container_width=True)
+        else:
+            st.warning("Heatmap not available.")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -322,33 +391,23 @@ if "result" in st.session_state:
     st.markdown('<div class="glass">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">📸 Export Dashboard Snapshot</div>', unsafe_allow_html=True)
 
+    snapshot_key = f"snapshot-{r['fingerprint']}"
     if st.button("📸 Generate Dashboard Snapshot"):
-        import cv2, numpy as np
-
-        export_dir = os.path.join(PROJECT_ROOT, "reports")
-        os.makedirs(export_dir, exist_ok=True)
-        export_path = os.path.join(export_dir, "StructScan_Dashboard.png")
-
-        annotated = r["annotated_image"]
-        heatmap = cv2.imread(heatmap_path) if heatmap_path else None
-
-        if heatmap is not None:
-            combined = np.hstack([
-                cv2.resize(annotated, (500, 400)),
-                cv2.resize(heatmap, (500, 400))
-            ])
-        else:
-            combined = cv2.resize(annotated, (1000, 400))
-
-        cv2.imwrite(export_path, combined)
-
-        with open(export_path, "rb") as img:
-            st.download_button(
-                "⬇️ Download Dashboard Snapshot",
-                img,
-                file_name="StructScan_Dashboard.png",
-                mime="image/png"
-            )
+        render_queue.submit(
+            snapshot_key,
+            render_snapshot,
+            result_image(r, "annotated", max(SNAPSHOT_SIZE)),
+            result_image(r, "heatmap", max(SNAPSHOT_SIZE))
+        )
+        st.session_state.snapshot_key = snapshot_key
+
+    if st.session_state.get("snapshot_key") == snapshot_key:
+        render_download(
+            snapshot_key,
+            "⬇️ Download Dashboard Snapshot",
+            "StructScan_Dashboard.png",
+            "image/png"
+        )
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -356,27 +415,24 @@ if "result" in st.session_state:
     st.markdown('<div class="glass">', unsafe_allow_html=True)
     st.markdown('<div class="section-title">📄 Inspection Report</div>', unsafe_allow_html=True)
 
+    report_key = f"report-{r['fingerprint']}-{engineer_name}-{project_id}"
     if st.button("📥 Generate PDF Report"):
-        report_path = os.path.join(PROJECT_ROOT, "reports", "StructScan_Report.pdf")
-
-        generate_pdf_report(
-            output_path=report_path,
-            engineer_name=engineer_name,
-            project_id=project_id,
-            crack_percentage=float(r["crack_percentage"]),
-            severity_score=float(r["severity_score"]),
-            risk_level=str(r["risk_level"]),
-            annotated_image_path=r["annotated_image_path"],
-            heatmap_path=heatmap_path
+        render_queue.submit(
+            report_key,
+            render_report,
+            r,
+            engineer_name,
+            project_id
+        )
+        st.session_state.report_key = report_key
+
+    if st.session_state.get("report_key") == report_key:
+        render_download(
+            report_key,
+            "⬇️ Download PDF",
+            "StructScan_Report.pdf",
+            "application/pdf"
         )
-
-        with open(report_path, "rb") as f:
-            st.download_button(
-                "⬇️ Download PDF",
-                f,
-                file_name="StructScan_Report.pdf",
-                mime="application/pdf"
-            )
 
 # ==================================================
 # FOOTER
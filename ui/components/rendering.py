@@ -0,0 +1,155 @@
+"""
+Background rendering of downloadable artifacts (PDF report, dashboard
+snapshot) for the Streamlit app.
+
+Rendering runs on a small thread pool shared by all sessions, so the
+script thread only submits work and polls it. Finished artifacts are
+kept in an LRU keyed by the result fingerprint (plus whatever else
+changes the output, e.g. the engineer name on the report), so repeated
+downloads and reruns reuse the bytes instead of rendering again.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+from src.inference.detect import pick_preview
+from src.report_generator import generate_pdf_report
+
+SNAPSHOT_SIZE = (500, 400)
+
+# Long side the single-image report needs (A4 image box at ~150 dpi)
+REPORT_IMAGE_SIDE = 1100
+
+
+# ==================================================
+# FINGERPRINT
+# ==================================================
+def result_fingerprint(result) -> str:
+    """
+    Stable ID of a pipeline result: its metrics, detections and the
+    encoded output images.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr((
+        round(float(result["crack_percentage"]), 6),
+        round(float(result["severity_score"]), 6),
+        result["risk_level"],
+        result.get("detections"),
+    )).encode("utf-8"))
+    for key in ("annotated_image_bytes", "heatmap_bytes"):
+        data = result.get(key)
+        if data is not None:
+            digest.update(hashlib.sha1(data).digest())
+    return digest.hexdigest()
+
+
+# ==================================================
+# RENDERERS
+# ==================================================
+def result_image(result, kind, max_side=None):
+    """
+    Encoded "annotated" or "heatmap" image of a result, at the smallest
+    preview level of at least `max_side` pixels when previews exist.
+    """
+    previews = result.get("previews")
+    if previews:
+        return pick_preview(previews[kind], max_side)
+    return result.get("annotated_image_bytes" if kind == "annotated" else "heatmap_bytes")
+
+
+def _decode(data):
+    if data is None:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def render_snapshot(annotated_jpg, heatmap_jpg=None) -> bytes:
+    """
+    Side-by-side annotated image and heatmap as PNG bytes, built from
+    the encoded images already held in the result.
+    """
+    annotated = _decode(annotated_jpg)
+    heatmap = _decode(heatmap_jpg)
+
+    if heatmap is not None:
+        combined = np.hstack([
+            cv2.resize(annotated, SNAPSHOT_SIZE, interpolation=cv2.INTER_AREA),
+            cv2.resize(heatmap, SNAPSHOT_SIZE, interpolation=cv2.INTER_AREA)
+        ])
+    else:
+        combined = cv2.resize(annotated, (SNAPSHOT_SIZE[0] * 2, SNAPSHOT_SIZE[1]), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode(".png", combined)
+    if not ok:
+        raise ValueError("Could not encode dashboard snapshot")
+    return buffer.tobytes()
+
+
+def render_report(result, engineer_name, project_id) -> bytes:
+    """
+    The single-image inspection PDF, rendered in memory.
+    """
+    buffer = BytesIO()
+    generate_pdf_report(
+        output_path=buffer,
+        engineer_name=engineer_name,
+        project_id=project_id,
+        crack_percentage=float(result["crack_percentage"]),
+        severity_score=float(result["severity_score"]),
+        risk_level=str(result["risk_level"]),
+        annotated_image=result_image(result, "annotated", REPORT_IMAGE_SIDE),
+        heatmap_image=result_image(result, "heatmap", REPORT_IMAGE_SIDE)
+    )
+    return buffer.getvalue()
+
+
+# ==================================================
+# BACKGROUND QUEUE + CACHE
+# ==================================================
+class RenderQueue:
+    """
+    Runs render jobs on a thread pool and remembers their futures by
+    key. Submitting a key that is pending or finished returns the
+    existing future; the oldest entries beyond `max_entries` are
+    dropped (pending jobs are never dropped).
+    """
+
+    def __init__(self, max_workers=2, max_entries=64):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._futures = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                self._futures.move_to_end(key)
+                return future
+
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._futures[key] = future
+            self._evict()
+            return future
+
+    def get(self, key):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+            return future
+
+    def _evict(self):
+        excess = len(self._futures) - self._max_entries
+        for key in list(self._futures):
+            if excess <= 0:
+                break
+            if self._futures[key].done():
+                del self._futures[key]
+                excess -= 1
@@ -0,0 +1,56 @@
+"""
+Per-session state and shared-model limits for the Streamlit app.
+
+Sessions keep only a compact copy of each result (metrics, detections
+and the encoded JPEGs), never the full-resolution arrays, and every
+analysis takes a slot from a process-wide semaphore so concurrent
+sessions cannot oversubscribe the single cached model.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("STRUCTSCAN_MAX_CONCURRENT_ANALYSES", "2"))
+ANALYSIS_WAIT_S = float(os.environ.get("STRUCTSCAN_ANALYSIS_WAIT_S", "60"))
+
+_COMPACT_KEYS = (
+    "crack_percentage",
+    "severity_score",
+    "risk_level",
+    "detections",
+    "annotated_image_bytes",
+    "heatmap_bytes",
+    "previews",
+)
+
+
+def compact_result(result):
+    """
+    The parts of a run_pipeline_image(..., previews=True) result the
+    UI needs, without the decoded image arrays. The full preview level
+    is the same bytes object as annotated_image_bytes / heatmap_bytes.
+    """
+    return {key: result.get(key) for key in _COMPACT_KEYS}
+
+
+def analysis_slots(limit=MAX_CONCURRENT_ANALYSES):
+    return threading.BoundedSemaphore(max(1, limit))
+
+
+@contextmanager
+def analysis_slot(slots, timeout=ANALYSIS_WAIT_S, on_wait=None):
+    """
+    Hold one analysis slot for the duration of the block. `on_wait()`
+    is called if the slot is not free right away; TimeoutError is
+    raised if none frees up within `timeout` seconds.
+    """
+    if not slots.acquire(blocking=False):
+        if on_wait is not None:
+            on_wait()
+        if not slots.acquire(timeout=timeout):
+            raise TimeoutError("No analysis slot became free")
+    try:
+        yield
+    finally:
+        slots.release()